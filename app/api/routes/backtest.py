@@ -67,10 +67,10 @@ async def run_backtest(request: BacktestRequest):
         from app.services.multi_datasource import DataSourceManager
 
         data_manager = DataSourceManager()
-        data = data_manager.fetch(
-            symbol=request.symbol,
-            start_date=request.start_date,
-            end_date=request.end_date
+        data = data_manager.fetch_with_fallback(
+            request.symbol,
+            request.start_date,
+            request.end_date
         )
 
         if data is None or len(data) == 0:
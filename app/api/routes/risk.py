@@ -107,20 +107,10 @@ async def update_risk_config(request: RiskConfigUpdateRequest):
         更新结果
     """
     try:
-        if request.total_capital is not None:
-            risk_validator.total_capital = request.total_capital
-
-        if request.max_total_loss_rate is not None:
-            risk_validator.max_total_loss_rate = request.max_total_loss_rate
-
-        if request.max_daily_loss_rate is not None:
-            risk_validator.max_daily_loss_rate = request.max_daily_loss_rate
-
-        if request.max_strategy_capital_rate is not None:
-            risk_validator.max_strategy_capital_rate = request.max_strategy_capital_rate
-
-        if request.max_single_trade_rate is not None:
-            risk_validator.max_single_trade_rate = request.max_single_trade_rate
+        # 一次性发布全部修改，并发的验证不会看到新旧混合的参数
+        changes = request.model_dump(exclude_none=True)
+        if changes:
+            risk_validator.update_config(changes)
 
         logger.info("风控配置已更新")
 
@@ -187,7 +177,7 @@ async def add_to_blacklist(symbol: str):
         添加结果
     """
     try:
-        risk_validator.blacklist.add(symbol)
+        risk_validator.add_to_blacklist(symbol)
 
         logger.info(f"添加到黑名单", symbol=symbol)
 
@@ -214,7 +204,7 @@ async def remove_from_blacklist(symbol: str):
     """
     try:
         if symbol in risk_validator.blacklist:
-            risk_validator.blacklist.remove(symbol)
+            risk_validator.remove_from_blacklist(symbol)
 
             logger.info(f"从黑名单移除", symbol=symbol)
 
@@ -18,6 +18,16 @@ logger = get_logger(__name__)
 # 全局数据库连接
 _db_connection: Optional[sqlite3.Connection] = None
 
+# 连接级PRAGMA（不随数据库文件持久化，每次建立连接时设置）
+CONNECTION_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA cache_size=-64000;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA busy_timeout=5000;
+"""
+
 
 def get_db_path() -> str:
     """
@@ -48,6 +58,7 @@ def get_db() -> sqlite3.Connection:
         db_path = get_db_path()
         _db_connection = sqlite3.connect(db_path, check_same_thread=False)
         _db_connection.row_factory = sqlite3.Row
+        _db_connection.executescript(CONNECTION_PRAGMAS)
 
         logger.info(f"数据库连接已建立", path=db_path)
 
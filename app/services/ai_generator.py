@@ -10,9 +10,11 @@ CN5-Lite AI策略生成器
 """
 
 import ast
+import copy
 import re
 import json
-from typing import Dict, Any, Optional, List
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, Optional, List, Set, Tuple
 from openai import OpenAI
 
 from app.errors import AIError, SecurityError, ValidationError, ComplexityError
@@ -20,6 +22,12 @@ from app.logger import get_logger
 
 logger = get_logger(__name__)
 
+# AI响应解析用的正则（模块加载时编译一次）
+_PYTHON_CODE_BLOCK = re.compile(r'```python\n(.*?)\n```', re.DOTALL)
+_PLAIN_CODE_BLOCK = re.compile(r'```\n(.*?)\n```', re.DOTALL)
+_STRATEGY_NAME = re.compile(r'策略名称[：:]\s*([^\n]+)')
+_STRATEGY_PARAMS = re.compile(r'参数[：:]\s*(\{[^}]+\})')
+
 
 # ==================
 # 圈复杂度计算
@@ -46,14 +54,14 @@ class ComplexityVisitor(ast.NodeVisitor):
         self.complexity += 1
         self.generic_visit(node)
 
-    def visit_And(self, node):
-        """and操作符增加复杂度"""
-        self.complexity += 1
+    def visit_BoolOp(self, node):
+        """and/or操作符增加复杂度（a and b and c 计为2）"""
+        self.complexity += len(node.values) - 1
         self.generic_visit(node)
 
-    def visit_Or(self, node):
-        """or操作符增加复杂度"""
-        self.complexity += 1
+    def visit_comprehension(self, node):
+        """推导式中的for及每个if条件增加复杂度"""
+        self.complexity += 1 + len(node.ifs)
         self.generic_visit(node)
 
     def visit_ExceptHandler(self, node):
@@ -98,23 +106,23 @@ class CodeSecurityChecker:
     """
 
     # 危险模块黑名单
-    DANGEROUS_MODULES = {
+    DANGEROUS_MODULES = frozenset({
         'os', 'sys', 'subprocess', 'shutil', 'pathlib',
         'socket', 'urllib', 'http', 'ftplib', 'telnetlib',
         '__import__', 'importlib', 'pickle', 'shelve',
         'ctypes', 'multiprocessing', 'threading'
-    }
+    })
 
     # 危险函数黑名单
-    DANGEROUS_FUNCTIONS = {
+    DANGEROUS_FUNCTIONS = frozenset({
         'eval', 'exec', 'compile', '__import__',
         'open', 'file', 'input', 'raw_input',
         'globals', 'locals', 'vars', 'dir',
         'getattr', 'setattr', 'delattr', 'hasattr'
-    }
+    })
 
     # 必需方法
-    REQUIRED_METHODS = {'on_bar'}
+    REQUIRED_METHODS = frozenset({'on_bar'})
 
     def __init__(self, max_complexity: int = 20):
         """
@@ -127,7 +135,7 @@ class CodeSecurityChecker:
 
     def check(self, code: str) -> Dict[str, Any]:
         """
-        执行安全检查
+        执行安全检查（按代码缓存，同一策略重复检查时跳过解析）
 
         Args:
             code: 待检查的代码
@@ -139,106 +147,135 @@ class CodeSecurityChecker:
                 "details": {...}
             }
         """
-        # 1. 语法检查
-        try:
-            tree = ast.parse(code)
-        except SyntaxError as e:
-            return {
-                "safe": False,
-                "message": f"语法错误: {e}",
-                "details": {"error": str(e)}
-            }
+        # 规则集可被子类或实例覆盖为普通set，转为frozenset才能作为缓存键
+        result = _check_code(
+            code,
+            self.max_complexity,
+            frozenset(self.DANGEROUS_MODULES),
+            frozenset(self.DANGEROUS_FUNCTIONS),
+            frozenset(self.REQUIRED_METHODS)
+        )
 
-        # 2. 危险导入检查
-        dangerous_imports = self._check_imports(tree)
-        if dangerous_imports:
-            return {
-                "safe": False,
-                "message": f"检测到危险导入: {', '.join(dangerous_imports)}",
-                "details": {"dangerous_imports": dangerous_imports}
-            }
+        # 缓存的结果是共享的，返回副本
+        return copy.deepcopy(result)
 
-        # 3. 危险函数检查
-        dangerous_calls = self._check_function_calls(tree)
-        if dangerous_calls:
-            return {
-                "safe": False,
-                "message": f"检测到危险函数调用: {', '.join(dangerous_calls)}",
-                "details": {"dangerous_calls": dangerous_calls}
-            }
 
-        # 4. 必需方法检查
-        missing_methods = self._check_required_methods(tree)
-        if missing_methods:
-            return {
-                "safe": False,
-                "message": f"缺少必需方法: {', '.join(missing_methods)}",
-                "details": {"missing_methods": missing_methods}
-            }
+def _scan_tree(
+    tree: ast.AST,
+    dangerous_modules: FrozenSet[str],
+    dangerous_functions: FrozenSet[str]
+) -> Tuple[List[str], List[str], Set[str]]:
+    """
+    一次遍历语法树，收集危险导入、危险函数调用和类方法名
 
-        # 5. 圈复杂度检查
-        complexity = calculate_complexity(code)
-        if complexity > self.max_complexity:
-            return {
-                "safe": False,
-                "message": f"圈复杂度过高: {complexity} > {self.max_complexity}",
-                "details": {"complexity": complexity, "max": self.max_complexity}
-            }
+    Args:
+        tree: 语法树
+        dangerous_modules: 危险模块
+        dangerous_functions: 危险函数
+
+    Returns:
+        (危险导入, 危险函数调用, 方法名集合)
+    """
+    dangerous_imports = []
+    dangerous_calls = []
+    methods = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name) and func.id in dangerous_functions:
+                dangerous_calls.append(func.id)
+
+        elif isinstance(node, ast.Import):
+            # 按顶层包判断，import os.path 同样拦截
+            for alias in node.names:
+                if alias.name.partition('.')[0] in dangerous_modules:
+                    dangerous_imports.append(alias.name)
+
+        elif isinstance(node, ast.ImportFrom):
+            if node.module and node.module.partition('.')[0] in dangerous_modules:
+                dangerous_imports.append(node.module)
+
+        elif isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef):
+                    methods.add(item.name)
+
+    return dangerous_imports, dangerous_calls, methods
+
+
+@lru_cache(maxsize=256)
+def _check_code(
+    code: str,
+    max_complexity: int,
+    dangerous_modules: FrozenSet[str],
+    dangerous_functions: FrozenSet[str],
+    required_methods: FrozenSet[str]
+) -> Dict[str, Any]:
+    """
+    安全检查实现（纯函数，按代码和检查规则缓存）
 
+    Returns:
+        检查结果，格式同CodeSecurityChecker.check
+    """
+    # 1. 语法检查
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
         return {
-            "safe": True,
-            "message": "代码安全检查通过",
-            "details": {
-                "complexity": complexity,
-                "methods_found": self._get_method_names(tree)
-            }
+            "safe": False,
+            "message": f"语法错误: {e}",
+            "details": {"error": str(e)}
         }
 
-    def _check_imports(self, tree: ast.AST) -> List[str]:
-        """检查危险导入"""
-        dangerous = []
-
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    if alias.name in self.DANGEROUS_MODULES:
-                        dangerous.append(alias.name)
-
-            elif isinstance(node, ast.ImportFrom):
-                if node.module in self.DANGEROUS_MODULES:
-                    dangerous.append(node.module)
-
-        return dangerous
-
-    def _check_function_calls(self, tree: ast.AST) -> List[str]:
-        """检查危险函数调用"""
-        dangerous = []
+    dangerous_imports, dangerous_calls, methods = _scan_tree(
+        tree, dangerous_modules, dangerous_functions
+    )
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name):
-                    if node.func.id in self.DANGEROUS_FUNCTIONS:
-                        dangerous.append(node.func.id)
-
-        return dangerous
+    # 2. 危险导入检查
+    if dangerous_imports:
+        return {
+            "safe": False,
+            "message": f"检测到危险导入: {', '.join(dangerous_imports)}",
+            "details": {"dangerous_imports": dangerous_imports}
+        }
 
-    def _check_required_methods(self, tree: ast.AST) -> List[str]:
-        """检查必需方法"""
-        found_methods = self._get_method_names(tree)
-        missing = self.REQUIRED_METHODS - found_methods
-        return list(missing)
+    # 3. 危险函数检查
+    if dangerous_calls:
+        return {
+            "safe": False,
+            "message": f"检测到危险函数调用: {', '.join(dangerous_calls)}",
+            "details": {"dangerous_calls": dangerous_calls}
+        }
 
-    def _get_method_names(self, tree: ast.AST) -> set:
-        """获取所有方法名"""
-        methods = set()
+    # 4. 必需方法检查
+    missing_methods = list(required_methods - methods)
+    if missing_methods:
+        return {
+            "safe": False,
+            "message": f"缺少必需方法: {', '.join(missing_methods)}",
+            "details": {"missing_methods": missing_methods}
+        }
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                for item in node.body:
-                    if isinstance(item, ast.FunctionDef):
-                        methods.add(item.name)
+    # 5. 圈复杂度检查（复用已解析的语法树）
+    visitor = ComplexityVisitor()
+    visitor.visit(tree)
+    complexity = visitor.complexity
+    if complexity > max_complexity:
+        return {
+            "safe": False,
+            "message": f"圈复杂度过高: {complexity} > {max_complexity}",
+            "details": {"complexity": complexity, "max": max_complexity}
+        }
 
-        return methods
+    return {
+        "safe": True,
+        "message": "代码安全检查通过",
+        "details": {
+            "complexity": complexity,
+            "methods_found": methods
+        }
+    }
 
 
 # ==================
@@ -338,28 +375,18 @@ class AIClient:
             "params": {}
         }
 
-        # 提取Python代码块
-        code_pattern = r'```python\n(.*?)\n```'
-        code_match = re.search(code_pattern, response, re.DOTALL)
-
+        # 提取Python代码块（其次尝试不带语言标识的代码块）
+        code_match = _PYTHON_CODE_BLOCK.search(response) or _PLAIN_CODE_BLOCK.search(response)
         if code_match:
             result["code"] = code_match.group(1).strip()
-        else:
-            # 尝试不带语言标识的代码块
-            code_pattern = r'```\n(.*?)\n```'
-            code_match = re.search(code_pattern, response, re.DOTALL)
-            if code_match:
-                result["code"] = code_match.group(1).strip()
 
         # 提取策略名称
-        name_pattern = r'策略名称[：:]\s*([^\n]+)'
-        name_match = re.search(name_pattern, response)
+        name_match = _STRATEGY_NAME.search(response)
         if name_match:
             result["name"] = name_match.group(1).strip()
 
         # 提取参数
-        params_pattern = r'参数[：:]\s*(\{[^}]+\})'
-        params_match = re.search(params_pattern, response)
+        params_match = _STRATEGY_PARAMS.search(response)
         if params_match:
             try:
                 result["params"] = json.loads(params_match.group(1))
@@ -465,19 +492,37 @@ class MAStrategy:
             if "previous_attempts" in context:
                 context_section += f"\n已尝试次数：{context['previous_attempts']}\n"
 
-        # 示例部分
-        examples_section = self.EXAMPLE if self.include_examples else ""
-
-        # 填充模板
-        prompt = self.STRATEGY_TEMPLATE.format(
+        # 填充模板（填入示例后的模板按内容缓存，修改示例或开关后自动失效）
+        template = _fill_examples(
+            self.STRATEGY_TEMPLATE,
+            self.EXAMPLE if self.include_examples else ""
+        )
+        prompt = template.format(
             user_input=user_input,
-            context_section=context_section,
-            examples_section=examples_section
+            context_section=context_section
         )
 
         return prompt
 
 
+@lru_cache(maxsize=8)
+def _fill_examples(template: str, examples_section: str) -> str:
+    """
+    将静态的示例部分填入模板（花括号转义，保持模板可format）
+
+    Args:
+        template: Prompt模板
+        examples_section: 示例部分
+
+    Returns:
+        仍可format其余字段的模板
+    """
+    return template.replace(
+        "{examples_section}",
+        examples_section.replace("{", "{{").replace("}", "}}")
+    )
+
+
 # ==================
 # AI策略生成器
 # ==================
@@ -627,6 +672,7 @@ class StrategySandbox:
             ExecutionError: 执行失败
         """
         from app.errors import ExecutionError
+        from app.services.strategy_adapter import _compile_strategy_code
         import signal
         import traceback
 
@@ -678,8 +724,8 @@ class StrategySandbox:
                 }
             }
 
-            # 执行代码
-            exec(code, namespace)
+            # 执行代码（与StrategyAdapter共用编译缓存）
+            exec(_compile_strategy_code(code), namespace)
 
             # 找到策略类
             strategy_class = None
@@ -786,6 +832,44 @@ class StrategyStorage:
 
         return strategy_id
 
+    def save_many(self, strategies: List[Dict[str, Any]]) -> List[int]:
+        """
+        批量保存策略（同一事务、一次提交）
+
+        Args:
+            strategies: 策略数据列表，格式同save
+
+        Returns:
+            策略ID列表（与输入顺序一致）
+        """
+        from datetime import datetime
+
+        query = """
+        INSERT INTO strategies (name, code, params, description, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """
+
+        now = datetime.now().isoformat()
+        rows = [
+            (
+                strategy_data.get("name", "未命名策略"),
+                strategy_data["code"],
+                json.dumps(strategy_data.get("params", {})),
+                strategy_data.get("description", ""),
+                now,
+                now
+            )
+            for strategy_data in strategies
+        ]
+
+        # executemany拿不到各行的ID，逐条插入但只提交一次
+        with self.db:
+            strategy_ids = [self.db.execute(query, row).lastrowid for row in rows]
+
+        logger.info(f"策略已批量保存", count=len(strategy_ids))
+
+        return strategy_ids
+
     def load(self, strategy_id: int) -> Optional[Dict[str, Any]]:
         """
         从数据库加载策略
@@ -870,6 +954,20 @@ class StrategyStorage:
 
         logger.info(f"策略已删除", strategy_id=strategy_id)
 
+    def delete_many(self, strategy_ids: List[int]):
+        """
+        批量删除策略（一次executemany、一次提交）
+
+        Args:
+            strategy_ids: 策略ID列表
+        """
+        query = "DELETE FROM strategies WHERE id = ?"
+
+        with self.db:
+            self.db.executemany(query, [(strategy_id,) for strategy_id in strategy_ids])
+
+        logger.info(f"策略已批量删除", count=len(strategy_ids))
+
 
 # ==================
 # 策略逻辑验证器
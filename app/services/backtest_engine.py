@@ -11,7 +11,7 @@ CN5-Lite 回测引擎
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime, timedelta
 
 from app.logger import get_logger
@@ -100,19 +100,105 @@ class BacktestEngine:
         adapter = StrategyAdapter(strategy_code, strategy_id=1)
 
         # 逐K线回测
-        for idx, row in data.iterrows():
+        for _ in self._replay(adapter, data, symbol):
+            pass
+
+        # 计算回测指标
+        result = self._calculate_metrics(data)
+
+        logger.info("回测完成", trades=result['total_trades'], final_value=result['final_value'])
+
+        return result
+
+    def run_stepwise(
+        self,
+        strategy_code: str,
+        data: pd.DataFrame,
+        symbol: str
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        逐K线执行回测，每根K线后产出截至当前的结果
+
+        第i次产出与对 data.iloc[:i+1] 单独调用run得到的
+        final_value/total_return/total_trades 相同，但整段数据只回放一遍。
+
+        Args:
+            strategy_code: 策略代码
+            data: 行情数据（DataFrame）
+            symbol: 股票代码
+
+        Yields:
+            {"date", "final_value", "total_return", "total_trades"}
+        """
+        self._reset()
+
+        adapter = StrategyAdapter(strategy_code, strategy_id=1)
+
+        total_trades = 0
+        seen_trades = 0
+
+        for date in self._replay(adapter, data, symbol):
+            # 只统计新增的交易
+            for trade in self.trades[seen_trades:]:
+                if trade['action'] == 'buy':
+                    total_trades += 1
+            seen_trades = len(self.trades)
+
+            final_value = self.portfolio_values[-1]
+            yield {
+                'date': date,
+                'final_value': final_value,
+                'total_return': (final_value - self.initial_cash) / self.initial_cash,
+                'total_trades': total_trades
+            }
+
+    def _replay(self, adapter: StrategyAdapter, data: pd.DataFrame, symbol: str) -> Iterator[Any]:
+        """
+        逐K线驱动策略并执行交易，每处理完一根K线产出该行日期
+
+        按列取出数据后逐行组装bar，避免iterrows为每行构造Series。
+
+        Args:
+            adapter: 策略适配器
+            data: 行情数据
+            symbol: 股票代码
+
+        Yields:
+            当前K线的原始日期
+        """
+        raw_dates = data['date']
+        if pd.api.types.is_datetime64_any_dtype(raw_dates):
+            bar_dates = raw_dates.dt.strftime('%Y-%m-%d').tolist()
+        else:
+            bar_dates = [
+                str(d.date()) if hasattr(d, 'date') else str(d)
+                for d in raw_dates
+            ]
+
+        columns = zip(
+            raw_dates.tolist(),
+            bar_dates,
+            data['open'].tolist(),
+            data['high'].tolist(),
+            data['low'].tolist(),
+            data['close'].tolist(),
+            data['volume'].tolist()
+        )
+
+        for raw_date, date, open_, high, low, close, volume in columns:
             bar = {
-                'date': str(row['date'].date()) if hasattr(row['date'], 'date') else str(row['date']),
-                'open': row['open'],
-                'high': row['high'],
-                'low': row['low'],
-                'close': row['close'],
-                'volume': row['volume']
+                'date': date,
+                'open': open_,
+                'high': high,
+                'low': low,
+                'close': close,
+                'volume': volume
             }
 
             # 检查停牌
             if self.enable_china_rules and self._is_suspended(bar):
-                logger.debug(f"停牌，跳过", date=bar['date'])
+                logger.debug(f"停牌，跳过", date=date)
+                yield raw_date
                 continue
 
             # 调用策略
@@ -123,15 +209,10 @@ class BacktestEngine:
                 self._execute_trade(signal, bar, symbol)
 
             # 记录账户价值
-            portfolio_value = self._calculate_portfolio_value(bar['close'])
+            portfolio_value = self._calculate_portfolio_value(close)
             self.portfolio_values.append(portfolio_value)
 
-        # 计算回测指标
-        result = self._calculate_metrics(data)
-
-        logger.info("回测完成", trades=result['total_trades'], final_value=result['final_value'])
-
-        return result
+            yield raw_date
 
     def _reset(self):
         """重置回测状态"""
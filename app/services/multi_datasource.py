@@ -7,15 +7,19 @@
 4. 停牌检测和处理
 5. 异常值过滤（3-sigma）
 6. Redis限流器（令牌桶算法）
+7. 进程内LRU缓存（位于Redis之前）
 """
 
 import pandas as pd
 import numpy as np
 import redis
 import pickle
+import threading
+import time
+from collections import OrderedDict
 from io import StringIO
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, List
+from typing import Any, Callable, Hashable, Optional, Dict, List
 from datetime import datetime
 import logging
 
@@ -24,6 +28,9 @@ from app.errors import DataSourceError, DataValidationError, CN5Error
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 缓存序列化协议（protocol 5 按原始缓冲区写入numpy数组，减少内存拷贝）
+CACHE_PICKLE_PROTOCOL = 5
+
 
 # ==================
 # 数据源提供者基类
@@ -186,6 +193,38 @@ class DataNormalizer:
         }
     }
 
+    # 标准列
+    STANDARD_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+    def __init__(self):
+        """初始化归一化器，为每个数据源预先生成专用的归一化函数"""
+        self._normalize_by_source = {
+            source: self._build_source_normalizer(mapping)
+            for source, mapping in self.COLUMN_MAPPING.items()
+        }
+        self._normalize_unknown = self._build_source_normalizer({})
+
+    def _build_source_normalizer(self, mapping: Dict[str, str]):
+        """
+        生成指定数据源的归一化函数
+
+        列映射在此处固化，恒等映射（如baostock）直接省去重命名步骤
+
+        Args:
+            mapping: 列名映射
+
+        Returns:
+            归一化函数
+        """
+        rename = {src: dst for src, dst in mapping.items() if src != dst}
+
+        def _normalize(data: pd.DataFrame) -> pd.DataFrame:
+            if rename:
+                data = data.rename(columns=rename)
+            return self._standardize(data)
+
+        return _normalize
+
     def normalize(self, data: pd.DataFrame, source: str) -> pd.DataFrame:
         """
         归一化数据
@@ -200,23 +239,36 @@ class DataNormalizer:
         if data.empty:
             return data
 
-        # 1. 重命名列
-        mapping = self.COLUMN_MAPPING.get(source, {})
-        data = data.rename(columns=mapping)
+        # 1. 重命名列（按数据源分派到预生成的函数）
+        normalize_fn = self._normalize_by_source.get(source, self._normalize_unknown)
+
+        return normalize_fn(data)
+
+    def _standardize(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        统一列、数据类型和排序
+
+        Args:
+            data: 已重命名的数据
 
+        Returns:
+            归一化后的数据
+        """
         # 2. 只保留标准列
-        standard_columns = ['date', 'open', 'high', 'low', 'close', 'volume']
-        data = data[[col for col in standard_columns if col in data.columns]]
+        columns = [col for col in self.STANDARD_COLUMNS if col in data.columns]
+        price_columns = [col for col in columns if col in ('open', 'high', 'low', 'close')]
 
-        # 3. 转换数据类型
-        data['date'] = pd.to_datetime(data['date'])
+        # 3. 转换数据类型（价格列一次性转换为float64矩阵，整表只构建一次）
+        converted = {'date': pd.to_datetime(data['date'])}
 
-        for col in ['open', 'high', 'low', 'close']:
-            if col in data.columns:
-                data[col] = data[col].astype(float)
+        if price_columns:
+            prices = data[price_columns].to_numpy(dtype=np.float64)
+            converted.update(zip(price_columns, prices.T))
 
-        if 'volume' in data.columns:
-            data['volume'] = data['volume'].astype(int)
+        if 'volume' in columns:
+            converted['volume'] = data['volume'].to_numpy(dtype=np.int64)
+
+        data = pd.DataFrame(converted)
 
         # 4. 排序
         data = data.sort_values('date').reset_index(drop=True)
@@ -240,19 +292,20 @@ class DataNormalizer:
         if data.empty:
             return
 
+        # fmax/fmin与pandas的max/min一致，忽略NaN
+        o, h, l, c = (data[col].to_numpy() for col in ('open', 'high', 'low', 'close'))
+
         # 检查 high >= max(open, close, low)
-        max_price = data[['open', 'close', 'low']].max(axis=1)
-        invalid_high = data[data['high'] < max_price]
+        invalid_high = np.count_nonzero(h < np.fmax(np.fmax(o, c), l))
 
-        if len(invalid_high) > 0:
-            raise DataValidationError(f"OHLC数据非法: {len(invalid_high)}条high < max(open,close,low)")
+        if invalid_high > 0:
+            raise DataValidationError(f"OHLC数据非法: {invalid_high}条high < max(open,close,low)")
 
         # 检查 low <= min(open, close, high)
-        min_price = data[['open', 'close', 'high']].min(axis=1)
-        invalid_low = data[data['low'] > min_price]
+        invalid_low = np.count_nonzero(l > np.fmin(np.fmin(o, c), h))
 
-        if len(invalid_low) > 0:
-            raise DataValidationError(f"OHLC数据非法: {len(invalid_low)}条low > min(open,close,high)")
+        if invalid_low > 0:
+            raise DataValidationError(f"OHLC数据非法: {invalid_low}条low > min(open,close,high)")
 
     def is_halt(self, bar: pd.Series) -> bool:
         """
@@ -278,23 +331,34 @@ class DataNormalizer:
             data: K线数据
 
         Returns:
-            处理后的数据
+            处理后的数据（不修改输入，只替换被填充的价格列）
         """
         if data.empty:
             return data
 
-        data = data.copy()
-
         # 停牌标记: volume=0
-        halt_mask = data['volume'] == 0
+        halt_mask = data['volume'].to_numpy() == 0
 
-        # 获取前一日收盘价（向前填充）
-        prev_close = data['close'].shift(1).ffill()
+        if not halt_mask.any():
+            return data
 
-        # 停牌日的所有价格用前一日收盘价填充
-        for col in ['open', 'high', 'low', 'close']:
-            if col in data.columns:
-                data.loc[halt_mask, col] = prev_close[halt_mask]
+        # 每个停牌日之前最近一个交易日的行号（一次累积扫描，代替shift+ffill）
+        last_trade_idx = np.where(halt_mask, -1, np.arange(len(data)))
+        np.maximum.accumulate(last_trade_idx, out=last_trade_idx)
+        src_idx = last_trade_idx[halt_mask]
+
+        # 获取前一交易日收盘价（开头即停牌的行没有参考价，保持NaN）
+        close = data['close'].to_numpy(dtype=np.float64)
+        prev_close = np.where(src_idx >= 0, close[src_idx], np.nan)
+
+        # 停牌日的所有价格一次性用前一日收盘价填充
+        price_columns = [col for col in ['open', 'high', 'low', 'close'] if col in data.columns]
+        prices = data[price_columns].to_numpy(dtype=np.float64)
+        prices[halt_mask] = prev_close[:, None]
+
+        # 浅拷贝后只替换价格列，避免整表复制
+        data = data.copy(deep=False)
+        data[price_columns] = prices
 
         return data
 
@@ -312,41 +376,46 @@ class DataNormalizer:
         if data.empty or len(data) == 0:
             return data
 
-        data = data.copy()
+        price_columns = [col for col in ['open', 'high', 'low', 'close'] if col in data.columns]
+        if not price_columns:
+            return data
+
+        prices = data[price_columns].to_numpy(dtype=np.float64)
+
+        # 方法1: IQR（四分位距）方法，一次计算所有价格列的四分位数
+        Q1, Q3 = np.nanquantile(prices, [0.25, 0.75], axis=0)
+        IQR = Q3 - Q1
+
+        # 使用1.5倍IQR作为阈值（经典boxplot标准）
+        lower = Q1 - 1.5 * IQR
+        upper = Q3 + 1.5 * IQR
+        iqr_columns = IQR > 0
 
         # 标记所有异常行（任一价格列为异常值即标记）
-        outlier_mask = pd.Series([False] * len(data), index=data.index)
-
-        # 对每个价格列检测异常值
-        for col in ['open', 'high', 'low', 'close']:
-            if col in data.columns:
-                # 方法1: IQR（四分位距）方法
-                Q1 = data[col].quantile(0.25)
-                Q3 = data[col].quantile(0.75)
-                IQR = Q3 - Q1
-
-                if IQR > 0:
-                    # 使用1.5倍IQR作为阈值（经典boxplot标准）
-                    lower = Q1 - 1.5 * IQR
-                    upper = Q3 + 1.5 * IQR
-                    outlier_mask |= (data[col] < lower) | (data[col] > upper)
-                else:
-                    # 方法2: 当IQR=0时，使用MAD (Median Absolute Deviation)
-                    median = data[col].median()
-                    mad = (data[col] - median).abs().median()
-
-                    if mad > 0:
-                        # 使用修改的z-score: |x - median| / MAD > threshold
-                        # 通常阈值为3.5对应3-sigma
-                        threshold = 3.5 * mad
-                        outlier_mask |= (data[col] - median).abs() > threshold
-                    else:
-                        # 方法3: MAD也为0时，检测绝对倍数差异
-                        # 如果某值与中位数相差超过中位数的10倍（对于股价来说很极端）
-                        if median > 0:
-                            outlier_mask |= (data[col] > median * 10) | (data[col] < median / 10)
-
-        # 删除异常值行
+        iqr_prices = prices[:, iqr_columns]
+        outlier_mask = ((iqr_prices < lower[iqr_columns]) | (iqr_prices > upper[iqr_columns])).any(axis=1)
+
+        # IQR=0的列逐列回退
+        for j in np.flatnonzero(~iqr_columns):
+            values = prices[:, j]
+
+            # 方法2: 当IQR=0时，使用MAD (Median Absolute Deviation)
+            median = np.nanmedian(values)
+            deviation = np.abs(values - median)
+            mad = np.nanmedian(deviation)
+
+            if mad > 0:
+                # 使用修改的z-score: |x - median| / MAD > threshold
+                # 通常阈值为3.5对应3-sigma
+                threshold = 3.5 * mad
+                outlier_mask |= deviation > threshold
+            else:
+                # 方法3: MAD也为0时，检测绝对倍数差异
+                # 如果某值与中位数相差超过中位数的10倍（对于股价来说很极端）
+                if median > 0:
+                    outlier_mask |= (values > median * 10) | (values < median / 10)
+
+        # 删除异常值行（布尔索引返回新表，无需预先复制）
         data = data[~outlier_mask]
 
         return data
@@ -366,7 +435,13 @@ class RateLimiter:
     - 使用Redis存储计数
     """
 
-    def __init__(self, redis_client: redis.Redis, limit: int = 1, window: int = 1):
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        limit: int = 1,
+        window: int = 1,
+        clock: Callable[[], float] = time.time
+    ):
         """
         初始化限流器
 
@@ -374,10 +449,12 @@ class RateLimiter:
             redis_client: Redis客户端
             limit: 限流次数
             window: 时间窗口（秒）
+            clock: 时钟函数（默认墙上时钟，多进程共享Redis时窗口对齐；测试可注入虚拟时钟）
         """
         self.redis = redis_client
         self.limit = limit
         self.window = window
+        self.clock = clock
 
     def check(self, source_name: str) -> bool:
         """
@@ -389,19 +466,89 @@ class RateLimiter:
         Returns:
             是否允许请求
         """
-        key = f"rate_limit:{source_name}"
+        # 按时钟划分固定窗口，窗口编号写入键名，窗口切换即重新计数
+        window_id = int(self.clock() // self.window)
+        key = f"rate_limit:{source_name}:{window_id}"
 
-        # 令牌桶算法
         current = self.redis.incr(key)
 
         if current == 1:
-            # 第一次请求，设置过期时间
+            # 第一次请求，设置过期时间（仅用于回收旧窗口的键）
             self.redis.expire(key, self.window)
 
         # 判断是否超过限制
         return current <= self.limit
 
 
+# ==================
+# 进程内缓存
+# ==================
+
+class LocalCache:
+    """
+    进程内LRU缓存（带过期时间）
+
+    功能：
+    - 位于Redis之前，重复请求无需网络往返和反序列化
+    - 超出容量时淘汰最久未使用的条目
+    - 线程安全
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        """
+        初始化缓存
+
+        Args:
+            maxsize: 最大条目数
+            ttl: 过期时间（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值，未命中或已过期返回None
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+        """
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
 # ==================
 # 多数据源管理器
 # ==================
@@ -413,16 +560,23 @@ class DataSourceManager:
     功能：
     1. 多源容错（AkShare → Baostock → Efinance）
     2. 数据归一化
-    3. 数据缓存（Redis）
+    3. 数据缓存（进程内LRU + Redis）
     4. 限流保护
     """
 
-    def __init__(self, cache: Optional[redis.Redis] = None):
+    def __init__(
+        self,
+        cache: Optional[redis.Redis] = None,
+        local_cache_size: int = 1024,
+        local_cache_ttl: float = 3600
+    ):
         """
         初始化管理器
 
         Args:
             cache: Redis缓存客户端（可选）
+            local_cache_size: 进程内缓存最大条目数
+            local_cache_ttl: 进程内缓存过期时间（秒）
         """
         # 配置数据源（按优先级）
         self.sources = [
@@ -436,6 +590,7 @@ class DataSourceManager:
 
         # 缓存
         self.cache = cache
+        self.local_cache = LocalCache(maxsize=local_cache_size, ttl=local_cache_ttl)
 
         # 限流器
         self.limiter = RateLimiter(cache, limit=1, window=1) if cache else None
@@ -445,7 +600,7 @@ class DataSourceManager:
         多源容错获取数据
 
         流程：
-        1. 检查缓存
+        1. 检查缓存（进程内 → Redis）
         2. 依次尝试各数据源
         3. 限流检查
         4. 数据归一化
@@ -464,6 +619,14 @@ class DataSourceManager:
             DataSourceError: 所有数据源均失败
         """
         # 1. 检查缓存
+        local_key = (symbol, start_date, end_date)
+        local_cached = self.local_cache.get(local_key)
+
+        if local_cached is not None:
+            logger.debug(f"进程内缓存命中: {local_key}")
+            # 返回副本，避免调用方修改缓存中的数据
+            return local_cached.copy()
+
         if self.cache:
             cache_key = f"kline:{symbol}:{start_date}:{end_date}"
             cached = self.cache.get(cache_key)
@@ -471,7 +634,9 @@ class DataSourceManager:
             if cached:
                 logger.info(f"缓存命中: {cache_key}")
                 # 使用pickle反序列化（比JSON快很多）
-                return pickle.loads(cached)
+                data = pickle.loads(cached)
+                self.local_cache.set(local_key, data.copy())
+                return data
 
         # 2. 依次尝试数据源
         last_error = None
@@ -502,9 +667,12 @@ class DataSourceManager:
 
                 logger.info(f"{source['name']} 获取数据成功: {len(data)}条")
 
-                # 写入缓存（使用pickle序列化，比JSON快很多）
+                # 写入缓存（使用pickle protocol 5序列化，比JSON快很多）
                 if self.cache:
-                    self.cache.setex(cache_key, 86400 * 7, pickle.dumps(data))  # 缓存7天
+                    payload = pickle.dumps(data, protocol=CACHE_PICKLE_PROTOCOL)
+                    self.cache.setex(cache_key, 86400 * 7, payload)  # 缓存7天
+
+                self.local_cache.set(local_key, data.copy())
 
                 return data
 
@@ -11,13 +11,188 @@ CN5-Lite 风控验证器
 7. 涨跌停板检测
 """
 
-from typing import Dict, Any, List, Optional, Set
-from datetime import datetime, timedelta
+import re
+import time
+from bisect import bisect_right, insort
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Deque, Dict, Any, Iterable, List, NamedTuple, Optional, Pattern, Sequence, Set, Tuple, Union
+from datetime import date, datetime
+import numpy as np
 from app.logger import get_logger
 from app.errors import RiskError
 
 logger = get_logger(__name__)
 
+# 特殊板块代码前缀 -> 股票类型
+BOARD_PREFIXES = {
+    'SH688': 'kcb',  # 科创板
+    'SZ300': 'cyb',  # 创业板
+}
+
+# 涨跌停幅度
+LIMIT_RATES = {
+    'normal': 0.10,  # 普通股票±10%
+    'st': 0.05,      # ST股票±5%
+    'cyb': 0.20,     # 创业板±20%
+    'kcb': 0.20      # 科创板±20%
+}
+
+# 涨跌停判定容差（0.1%）
+LIMIT_TOLERANCE = 0.001
+
+# 交易频率统计窗口（秒），超出窗口的交易记录会被清理
+TRADE_WINDOW_SECONDS = 3600.0
+
+# 批量验证的拒绝原因（按风控层级编号）
+RISK_REASON_TEXTS = np.array([
+    '通过',
+    '总资金止损触发',
+    '黑名单股票',
+    '单日亏损限制触发',
+    '单策略资金占用超限',
+    '单笔交易过大',
+    '交易频率过高',
+    '涨停板，不建议买入',
+    '跌停板，不建议卖出'
+])
+
+
+@lru_cache(maxsize=32)
+def _compile_st_pattern(st_keywords: Tuple[str, ...]) -> Pattern:
+    """将ST关键字编译为单个正则"""
+    return re.compile('|'.join(map(re.escape, st_keywords)))
+
+
+@lru_cache(maxsize=4096)
+def _limit_price_decision(
+    stock_type: str,
+    current_price: float,
+    prev_close: float,
+    action: str
+) -> Tuple[bool, str]:
+    """
+    涨跌停判定（纯函数，按股票类型、价格、昨收价、动作精确缓存）
+
+    Args:
+        stock_type: 股票类型
+        current_price: 当前价格
+        prev_close: 昨收价（非0）
+        action: 交易动作
+
+    Returns:
+        (是否允许, 原因)
+    """
+    limit_rate = LIMIT_RATES.get(stock_type, 0.10)
+    price_change_rate = (current_price - prev_close) / prev_close
+
+    # 检查涨停
+    if action == 'buy' and price_change_rate >= limit_rate - LIMIT_TOLERANCE:
+        return False, f'涨停板，不建议买入：当前涨幅{price_change_rate:.1%}'
+
+    # 检查跌停
+    if action == 'sell' and price_change_rate <= -limit_rate + LIMIT_TOLERANCE:
+        return False, f'跌停板，不建议卖出：当前跌幅{price_change_rate:.1%}'
+
+    return True, ''
+
+
+@lru_cache(maxsize=8192)
+def _classify_stock(symbol: str, st_keywords: Tuple[str, ...]) -> str:
+    """
+    判断股票类型（纯函数，按代码缓存）
+
+    关键字元组是缓存键的一部分，关键字变化时不会命中旧结果。
+
+    Args:
+        symbol: 股票代码
+        st_keywords: ST关键字
+
+    Returns:
+        股票类型（normal/st/cyb/kcb）
+    """
+    # ST股票
+    if _compile_st_pattern(st_keywords).search(symbol) is not None:
+        return 'st'
+
+    # 科创板/创业板按前缀查表，其余为普通股票
+    return BOARD_PREFIXES.get(symbol[:5], 'normal')
+
+
+class RiskConfig(NamedTuple):
+    """风控参数（不可变，运行时整体替换）"""
+    total_capital: float
+    max_total_loss_rate: float
+    max_daily_loss_rate: float
+    max_strategy_capital_rate: float
+    max_single_trade_rate: float
+    max_trades_per_hour: int
+    daily_start_value: float
+
+
+class RiskThresholds(NamedTuple):
+    """风控参数及按其预计算的各层绝对金额阈值"""
+    config: RiskConfig
+    hard_total_loss_value: float
+    warn_total_loss_value: float
+    hard_daily_loss_value: float
+    warn_daily_loss_value: float
+    hard_strategy_cap_value: float
+    warn_strategy_cap_value: float
+    hard_single_trade_value: float
+    warn_single_trade_value_70: float
+    warn_single_trade_value_50: float
+    warn_trades_per_hour: float
+
+    @classmethod
+    def from_config(cls, config: RiskConfig) -> 'RiskThresholds':
+        """
+        按风控参数计算阈值
+
+        Args:
+            config: 风控参数
+
+        Returns:
+            阈值快照
+        """
+        hard_total_loss_value = config.total_capital * config.max_total_loss_rate
+        hard_daily_loss_value = config.daily_start_value * config.max_daily_loss_rate
+        hard_strategy_cap_value = config.total_capital * config.max_strategy_capital_rate
+        hard_single_trade_value = config.total_capital * config.max_single_trade_rate
+
+        return cls(
+            config=config,
+            hard_total_loss_value=hard_total_loss_value,
+            warn_total_loss_value=hard_total_loss_value * 0.5,
+            hard_daily_loss_value=hard_daily_loss_value,
+            warn_daily_loss_value=hard_daily_loss_value * 0.5,
+            hard_strategy_cap_value=hard_strategy_cap_value,
+            warn_strategy_cap_value=hard_strategy_cap_value * 0.7,
+            hard_single_trade_value=hard_single_trade_value,
+            warn_single_trade_value_70=hard_single_trade_value * 0.7,
+            warn_single_trade_value_50=hard_single_trade_value * 0.5,
+            warn_trades_per_hour=config.max_trades_per_hour * 0.7
+        )
+
+
+def _threshold_setting(name: str) -> property:
+    """
+    风控参数属性：赋值后发布新的参数与阈值快照
+
+    Args:
+        name: 参数名
+
+    Returns:
+        property对象
+    """
+    def getter(self):
+        return getattr(self._thresholds.config, name)
+
+    def setter(self, value):
+        self._publish_config(**{name: value})
+
+    return property(getter, setter)
+
 
 # ==================
 # 7层风控验证器
@@ -37,6 +212,25 @@ class RiskValidator:
     7. 涨跌停板检测
     """
 
+    # 影响阈值的参数，运行时修改会自动重算阈值
+    total_capital = _threshold_setting('total_capital')
+    max_total_loss_rate = _threshold_setting('max_total_loss_rate')
+    max_daily_loss_rate = _threshold_setting('max_daily_loss_rate')
+    max_strategy_capital_rate = _threshold_setting('max_strategy_capital_rate')
+    max_single_trade_rate = _threshold_setting('max_single_trade_rate')
+    max_trades_per_hour = _threshold_setting('max_trades_per_hour')
+    daily_start_value = _threshold_setting('daily_start_value')
+
+    # update_config允许修改的参数
+    _CONFIG_KEYS = (
+        'total_capital',
+        'max_total_loss_rate',
+        'max_daily_loss_rate',
+        'max_strategy_capital_rate',
+        'max_single_trade_rate',
+        'max_trades_per_hour'
+    )
+
     def __init__(
         self,
         total_capital: float,
@@ -45,7 +239,8 @@ class RiskValidator:
         max_strategy_capital_rate: float = 0.30, # 单策略30%
         max_single_trade_rate: float = 0.20,    # 单笔20%
         max_trades_per_hour: int = 20,          # 每小时20笔
-        blacklist: Optional[List[str]] = None
+        blacklist: Optional[List[str]] = None,
+        clock: Callable[[], float] = time.time
     ):
         """
         初始化风控验证器
@@ -58,20 +253,25 @@ class RiskValidator:
             max_single_trade_rate: 单笔最大交易占比
             max_trades_per_hour: 每小时最大交易次数
             blacklist: 自定义黑名单
+            clock: 时钟函数（返回epoch秒，测试时可注入虚拟时钟）
         """
-        self.total_capital = total_capital
-        self.max_total_loss_rate = max_total_loss_rate
-        self.max_daily_loss_rate = max_daily_loss_rate
-        self.max_strategy_capital_rate = max_strategy_capital_rate
-        self.max_single_trade_rate = max_single_trade_rate
-        self.max_trades_per_hour = max_trades_per_hour
+        self._thresholds = RiskThresholds.from_config(RiskConfig(
+            total_capital=total_capital,
+            max_total_loss_rate=max_total_loss_rate,
+            max_daily_loss_rate=max_daily_loss_rate,
+            max_strategy_capital_rate=max_strategy_capital_rate,
+            max_single_trade_rate=max_single_trade_rate,
+            max_trades_per_hour=max_trades_per_hour,
+            daily_start_value=total_capital
+        ))
+        self._clock = clock
 
         # 状态管理
         self.current_account_value = total_capital
-        self.daily_start_value = total_capital
+        self._current_day: Optional[int] = None  # 当前交易日（date.toordinal()）
         self.strategy_capitals: Dict[int, float] = {}  # {strategy_id: capital}
         self.prev_close_prices: Dict[str, float] = {}  # {symbol: price}
-        self.trade_timestamps: List[datetime] = []
+        self.trade_timestamps: Deque[float] = deque()  # epoch秒，按时间升序
 
         # 黑名单
         self.blacklist: Set[str] = set(blacklist) if blacklist else set()
@@ -82,7 +282,43 @@ class RiskValidator:
     def _init_default_blacklist(self):
         """初始化默认黑名单（ST、退市等）"""
         # ST股票特征
-        self.st_keywords = ['ST', '*ST', 'S*ST', '退市']
+        self._st_keywords = ('ST', '*ST', 'S*ST', '退市')
+        self._st_pattern = _compile_st_pattern(self._st_keywords)
+
+    @property
+    def st_keywords(self) -> List[str]:
+        """ST股票关键字（只读）"""
+        return list(self._st_keywords)
+
+    def _publish_config(self, **changes):
+        """
+        基于当前参数生成新的参数与阈值快照，并一次性替换
+
+        单次引用赋值，并发执行的validate要么看到全部旧值，要么看到全部新值。
+
+        Args:
+            **changes: 要修改的参数
+        """
+        config = self._thresholds.config._replace(**changes)
+        self._thresholds = RiskThresholds.from_config(config)
+
+    def update_config(self, config: Dict[str, Any]):
+        """
+        运行时更新风控参数
+
+        Args:
+            config: 参数字典（如 {"max_total_loss_rate": 0.08}）
+
+        Raises:
+            RiskError: 未知参数
+        """
+        unknown = [key for key in config if key not in self._CONFIG_KEYS]
+        if unknown:
+            raise RiskError(f"未知风控参数: {', '.join(unknown)}")
+
+        self._publish_config(**config)
+
+        logger.info("风控参数已更新", **config)
 
     def validate(self, signal: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -106,22 +342,21 @@ class RiskValidator:
         strategy_id = signal.get('strategy_id', 1)
 
         trade_value = amount * price
-        risk_factors = []
-        risk_score = 0
+
+        # 取一次快照，本次验证始终使用同一组参数
+        thresholds = self._thresholds
+        config = thresholds.config
 
         # 第1层：总资金止损
-        total_loss_rate = (self.total_capital - self.current_account_value) / self.total_capital
-        if total_loss_rate > self.max_total_loss_rate:
+        total_loss = config.total_capital - self.current_account_value
+        if total_loss > thresholds.hard_total_loss_value:
+            total_loss_rate = total_loss / config.total_capital
             return {
                 'passed': False,
-                'reason': f'总资金止损触发：当前亏损{total_loss_rate:.1%}，超过限制{self.max_total_loss_rate:.1%}',
+                'reason': f'总资金止损触发：当前亏损{total_loss_rate:.1%}，超过限制{config.max_total_loss_rate:.1%}',
                 'risk_score': 100
             }
 
-        # 累加风险评分
-        if total_loss_rate > self.max_total_loss_rate * 0.5:
-            risk_score += 20
-
         # 第2层：黑名单股票
         if self._is_blacklisted(symbol):
             return {
@@ -131,66 +366,50 @@ class RiskValidator:
             }
 
         # 第3层：单日亏损限制
-        daily_loss_rate = (self.daily_start_value - self.current_account_value) / self.daily_start_value
-        if daily_loss_rate > self.max_daily_loss_rate:
+        daily_loss = config.daily_start_value - self.current_account_value
+        if daily_loss > thresholds.hard_daily_loss_value:
+            daily_loss_rate = daily_loss / config.daily_start_value
             return {
                 'passed': False,
-                'reason': f'单日亏损限制触发：当前亏损{daily_loss_rate:.1%}，超过限制{self.max_daily_loss_rate:.1%}',
+                'reason': f'单日亏损限制触发：当前亏损{daily_loss_rate:.1%}，超过限制{config.max_daily_loss_rate:.1%}',
                 'risk_score': 100
             }
 
-        # 累加风险评分
-        if daily_loss_rate > self.max_daily_loss_rate * 0.5:
-            risk_score += 15
-
         # 第4层：单策略资金占用（仅买入）
-        if action == 'buy':
-            current_capital = self.strategy_capitals.get(strategy_id, 0)
-            new_capital = current_capital + trade_value
-            capital_rate = new_capital / self.total_capital
+        is_buy = action == 'buy'
+        new_capital = 0
+        if is_buy:
+            new_capital = self.strategy_capitals.get(strategy_id, 0) + trade_value
 
-            if capital_rate > self.max_strategy_capital_rate:
+            if new_capital > thresholds.hard_strategy_cap_value:
+                capital_rate = new_capital / config.total_capital
                 return {
                     'passed': False,
-                    'reason': f'单策略资金占用超限：当前{capital_rate:.1%}，超过限制{self.max_strategy_capital_rate:.1%}',
+                    'reason': f'单策略资金占用超限：当前{capital_rate:.1%}，超过限制{config.max_strategy_capital_rate:.1%}',
                     'risk_score': 100
                 }
 
-            # 累加风险评分
-            if capital_rate > self.max_strategy_capital_rate * 0.7:
-                risk_score += 15
-
         # 第5层：单笔过大
-        trade_rate = trade_value / self.total_capital
-        if trade_rate > self.max_single_trade_rate:
+        if trade_value > thresholds.hard_single_trade_value:
+            trade_rate = trade_value / config.total_capital
             return {
                 'passed': False,
-                'reason': f'单笔交易过大：当前{trade_rate:.1%}，超过限制{self.max_single_trade_rate:.1%}',
+                'reason': f'单笔交易过大：当前{trade_rate:.1%}，超过限制{config.max_single_trade_rate:.1%}',
                 'risk_score': 100
             }
 
-        # 累加风险评分
-        if trade_rate > self.max_single_trade_rate * 0.7:
-            risk_score += 20
-        elif trade_rate > self.max_single_trade_rate * 0.5:
-            risk_score += 10
-
         # 第6层：交易频率
         recent_trades = self._count_recent_trades(hours=1)
-        if recent_trades >= self.max_trades_per_hour:
+        if recent_trades >= config.max_trades_per_hour:
             return {
                 'passed': False,
-                'reason': f'交易频率过高：1小时内{recent_trades}笔，超过限制{self.max_trades_per_hour}笔',
+                'reason': f'交易频率过高：1小时内{recent_trades}笔，超过限制{config.max_trades_per_hour}笔',
                 'risk_score': 100
             }
 
-        # 累加风险评分
-        if recent_trades > self.max_trades_per_hour * 0.7:
-            risk_score += 15
-
         # 第7层：涨跌停板
-        if symbol in self.prev_close_prices:
-            prev_close = self.prev_close_prices[symbol]
+        prev_close = self.prev_close_prices.get(symbol)
+        if prev_close is not None:
             limit_result = self._check_limit_price(symbol, price, prev_close, action)
 
             if not limit_result['allowed']:
@@ -200,6 +419,16 @@ class RiskValidator:
                     'risk_score': 100
                 }
 
+        # 风险评分：各层预警条件按布尔值加权求和
+        risk_score = (
+            20 * (total_loss > thresholds.warn_total_loss_value)
+            + 15 * (daily_loss > thresholds.warn_daily_loss_value)
+            + 15 * (is_buy and new_capital > thresholds.warn_strategy_cap_value)
+            + 10 * (trade_value > thresholds.warn_single_trade_value_50)
+            + 10 * (trade_value > thresholds.warn_single_trade_value_70)
+            + 15 * (recent_trades > thresholds.warn_trades_per_hour)
+        )
+
         # 所有层级通过
         logger.info(f"风控验证通过", symbol=symbol, amount=amount, risk_score=risk_score)
 
@@ -209,12 +438,98 @@ class RiskValidator:
             'risk_score': risk_score
         }
 
+    def validate_batch(
+        self,
+        action: Sequence[str],
+        symbol: Sequence[str],
+        amount: Sequence[float],
+        price: Sequence[float],
+        strategy_id: Sequence[int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量执行7层风控验证
+
+        每条信号都基于当前状态独立判断，等价于逐条调用validate且不更新状态。
+
+        Args:
+            action: 交易动作
+            symbol: 股票代码
+            amount: 数量
+            price: 价格
+            strategy_id: 策略ID
+
+        Returns:
+            (passed, reason_code)，reason_code为0表示通过，
+            可用 np.take(RISK_REASON_TEXTS, reason_code) 得到原因
+        """
+        action = np.asarray(action)
+        amount = np.asarray(amount, dtype=np.float64)
+        price = np.asarray(price, dtype=np.float64)
+        trade_value = amount * price
+        is_buy = action == 'buy'
+
+        # 取一次快照，整批使用同一组参数
+        thresholds = self._thresholds
+        config = thresholds.config
+
+        # 账户级检查对整批相同
+        total_loss = config.total_capital - self.current_account_value
+        daily_loss = config.daily_start_value - self.current_account_value
+        recent_trades = self._count_recent_trades(hours=1)
+
+        # 按股票/策略查表（去重后只查一次）
+        symbols, symbol_idx = np.unique(np.asarray(symbol, dtype=str), return_inverse=True)
+        blacklisted = np.array([self._is_blacklisted(s) for s in symbols], dtype=bool)[symbol_idx]
+        prev_close = np.array([self.prev_close_prices.get(s, 0.0) for s in symbols], dtype=np.float64)[symbol_idx]
+        limit_rate = np.array([LIMIT_RATES[self._get_stock_type(s)] for s in symbols])[symbol_idx]
+        strategy_capital = np.array(
+            [self.strategy_capitals.get(sid, 0) for sid in strategy_id], dtype=np.float64
+        )
+
+        # 涨跌幅（无昨收价时为0，不触发涨跌停）
+        has_prev = prev_close != 0
+        change_rate = np.divide(price - prev_close, prev_close, out=np.zeros_like(price), where=has_prev)
+
+        conditions = [
+            np.full(len(action), total_loss > thresholds.hard_total_loss_value),
+            blacklisted,
+            np.full(len(action), daily_loss > thresholds.hard_daily_loss_value),
+            is_buy & (strategy_capital + trade_value > thresholds.hard_strategy_cap_value),
+            trade_value > thresholds.hard_single_trade_value,
+            np.full(len(action), recent_trades >= config.max_trades_per_hour),
+            has_prev & is_buy & (change_rate >= limit_rate - LIMIT_TOLERANCE),
+            has_prev & (action == 'sell') & (change_rate <= -limit_rate + LIMIT_TOLERANCE)
+        ]
+
+        # np.select按层级顺序取第一个触发的原因
+        reason_code = np.select(conditions, np.arange(1, len(conditions) + 1), default=0).astype(np.int8)
+        return reason_code == 0, reason_code
+
     # ==================
     # 第1层：总资金止损
     # ==================
 
-    def update_account_value(self, value: float):
-        """更新账户总价值"""
+    def update_account_value(self, value: float, day: Union[int, date, str, None] = None):
+        """
+        更新账户总价值
+
+        传入交易日时按整数日序号跟踪换日：进入新交易日时，
+        以上一次的账户价值作为今日开始价值。
+
+        Args:
+            value: 账户总价值
+            day: 交易日（date.toordinal()整数，也接受date或'YYYY-MM-DD'）
+        """
+        if day is not None:
+            if isinstance(day, str):
+                day = date.fromisoformat(day).toordinal()
+            elif isinstance(day, date):
+                day = day.toordinal()
+
+            if day != self._current_day:
+                self._current_day = day
+                self.daily_start_value = self.current_account_value
+
         self.current_account_value = value
 
     # ==================
@@ -236,11 +551,19 @@ class RiskValidator:
             return True
 
         # 检查ST等特殊股票
-        for keyword in self.st_keywords:
-            if keyword in symbol:
-                return True
+        return self._st_pattern.search(symbol) is not None
+
+    def add_to_blacklist(self, symbol: str):
+        """添加股票到黑名单"""
+        self.blacklist.add(symbol)
 
-        return False
+    def extend_blacklist(self, symbols: Iterable[str]):
+        """批量添加股票到黑名单"""
+        self.blacklist.update(symbols)
+
+    def remove_from_blacklist(self, symbol: str):
+        """从黑名单移除股票（不存在时忽略）"""
+        self.blacklist.discard(symbol)
 
     # ==================
     # 第3层：单日亏损
@@ -280,14 +603,28 @@ class RiskValidator:
         Args:
             timestamp: 交易时间（默认当前时间）
         """
-        if timestamp is None:
-            timestamp = datetime.now()
+        now = self._clock()
+        ts = now if timestamp is None else timestamp.timestamp()
 
-        self.trade_timestamps.append(timestamp)
+        # 保持升序，补录的较早交易按时间插入
+        if self.trade_timestamps and ts < self.trade_timestamps[-1]:
+            insort(self.trade_timestamps, ts)
+        else:
+            self.trade_timestamps.append(ts)
 
         # 清理1小时以外的记录
-        cutoff = datetime.now() - timedelta(hours=1)
-        self.trade_timestamps = [t for t in self.trade_timestamps if t > cutoff]
+        self._evict_expired_trades(now - TRADE_WINDOW_SECONDS)
+
+    def _evict_expired_trades(self, cutoff: float):
+        """
+        从队头弹出早于截止时间的交易记录
+
+        Args:
+            cutoff: 截止时间（epoch秒）
+        """
+        timestamps = self.trade_timestamps
+        while timestamps and timestamps[0] <= cutoff:
+            timestamps.popleft()
 
     def _count_recent_trades(self, hours: int = 1) -> int:
         """
@@ -299,8 +636,15 @@ class RiskValidator:
         Returns:
             交易次数
         """
-        cutoff = datetime.now() - timedelta(hours=hours)
-        return sum(1 for t in self.trade_timestamps if t > cutoff)
+        now = self._clock()
+        cutoff = now - hours * 3600.0
+
+        # 只按自身的1小时窗口清理，更长的窗口只统计不清理
+        if cutoff >= now - TRADE_WINDOW_SECONDS:
+            self._evict_expired_trades(now - TRADE_WINDOW_SECONDS)
+
+        # 记录有序，二分定位截止位置
+        return len(self.trade_timestamps) - bisect_right(self.trade_timestamps, cutoff)
 
     # ==================
     # 第7层：涨跌停板
@@ -338,39 +682,12 @@ class RiskValidator:
         if prev_close == 0:
             return {'allowed': True, 'reason': ''}
 
-        # 判断股票类型
-        stock_type = self._get_stock_type(symbol)
-
-        # 涨跌停幅度
-        limit_rates = {
-            'normal': 0.10,  # 普通股票±10%
-            'st': 0.05,      # ST股票±5%
-            'cyb': 0.20,     # 创业板±20%
-            'kcb': 0.20      # 科创板±20%
-        }
-
-        limit_rate = limit_rates.get(stock_type, 0.10)
-
-        # 计算涨跌幅
-        price_change_rate = (current_price - prev_close) / prev_close
-
-        # 检查涨停
-        if price_change_rate >= limit_rate - 0.001:  # 容差0.1%
-            if action == 'buy':
-                return {
-                    'allowed': False,
-                    'reason': f'涨停板，不建议买入：当前涨幅{price_change_rate:.1%}'
-                }
+        # 重复的行情（同一价格、昨收价）直接命中缓存
+        allowed, reason = _limit_price_decision(
+            self._get_stock_type(symbol), current_price, prev_close, action
+        )
 
-        # 检查跌停
-        if price_change_rate <= -limit_rate + 0.001:  # 容差0.1%
-            if action == 'sell':
-                return {
-                    'allowed': False,
-                    'reason': f'跌停板，不建议卖出：当前跌幅{price_change_rate:.1%}'
-                }
-
-        return {'allowed': True, 'reason': ''}
+        return {'allowed': allowed, 'reason': reason}
 
     def _get_stock_type(self, symbol: str) -> str:
         """
@@ -382,17 +699,4 @@ class RiskValidator:
         Returns:
             股票类型（normal/st/cyb/kcb）
         """
-        # ST股票
-        if any(kw in symbol for kw in self.st_keywords):
-            return 'st'
-
-        # 科创板（688开头）
-        if symbol.startswith('SH688'):
-            return 'kcb'
-
-        # 创业板（300开头）
-        if symbol.startswith('SZ300'):
-            return 'cyb'
-
-        # 普通股票
-        return 'normal'
+        return _classify_stock(symbol, self._st_keywords)
@@ -12,9 +12,11 @@ CN5-Lite 影子账户管理器
 """
 
 import math
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Tuple
+from datetime import date, datetime, timedelta
 
 from app.logger import get_logger
 from app.errors import ValidationError
@@ -23,6 +25,45 @@ from app.services.backtest_engine import BacktestEngine
 logger = get_logger(__name__)
 
 
+# 账户状态编码（列式索引使用）
+STATUS_CODES = {
+    'observing': 0,
+    'promoted': 1,
+    'terminated': 2
+}
+STATUS_NAMES = tuple(STATUS_CODES)
+
+
+# ==================
+# 每日收益序列
+# ==================
+
+class _DailySeries:
+    """
+    每日记录的列式存储（日期、收益率），按倍增策略扩容
+
+    与账户中的daily_records列表并行维护，供加权收益率向量化计算。
+    """
+
+    __slots__ = ('dates', 'returns', 'size')
+
+    def __init__(self, capacity: int = 16):
+        self.dates = np.empty(capacity, dtype='datetime64[D]')
+        self.returns = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+
+    def append(self, record_date: np.datetime64, record_return: float):
+        """追加一条记录"""
+        if self.size == len(self.dates):
+            capacity = 2 * len(self.dates)
+            self.dates = np.resize(self.dates, capacity)
+            self.returns = np.resize(self.returns, capacity)
+
+        self.dates[self.size] = record_date
+        self.returns[self.size] = record_return
+        self.size += 1
+
+
 # ==================
 # 影子账户管理器
 # ==================
@@ -38,29 +79,84 @@ class ShadowManager:
     4. 晋升到实盘
     """
 
+    # 时间权重查找表覆盖的天数
+    TIME_WEIGHT_LUT_DAYS = 365
+
     def __init__(self):
         """初始化管理器"""
         self.accounts: Dict[int, Dict[str, Any]] = {}
         self.next_account_id = 1
 
-        # 评分权重
-        self.score_weights = {
+        # 评分权重（只读视图见score_weights，修改请使用set_score_weights）
+        self.set_score_weights({
             'annual_return': 0.30,      # 年化收益率 30%
             'sharpe_ratio': 0.25,       # 夏普比率 25%
             'max_drawdown': 0.20,       # 最大回撤 20%
             'volatility': 0.15,         # 波动率 15%
             'win_rate': 0.10            # 胜率 10%
-        }
+        })
+
+        # 每日记录列式副本 {account_id: _DailySeries}
+        self._daily_series: Dict[int, _DailySeries] = {}
+
+        # 账户状态/评分的列式存储（唯一数据源），供Top N筛选向量化
+        self._id_to_row: Dict[int, int] = {}
+        self._row_ids = np.empty(16, dtype=np.int64)
+        self._row_status = np.empty(16, dtype=np.int8)
+        self._row_score = np.empty(16, dtype=np.float64)
+        self._row_count = 0
 
         # 晋升条件
         self.promotion_min_score = 35.0
         self.promotion_min_days = 14
 
-        # 时间权重半衰期（天）
+        # 时间权重半衰期（天），赋值时重建权重查找表
         self.time_decay_halflife = 7
 
         logger.info("影子账户管理器初始化完成")
 
+    @property
+    def time_decay_halflife(self) -> float:
+        """时间权重半衰期（天）"""
+        return self._time_decay_halflife
+
+    @time_decay_halflife.setter
+    def time_decay_halflife(self, halflife: float):
+        self._time_decay_halflife = halflife
+        self._time_weight_lut = 0.5 ** (np.arange(self.TIME_WEIGHT_LUT_DAYS) / halflife)
+
+    @property
+    def score_weights(self) -> Mapping[str, float]:
+        """评分权重（只读）"""
+        return self._score_weights_view
+
+    def _index_account(self, account_id: int):
+        """为新账户分配列式索引行"""
+        row = self._row_count
+        if row == len(self._row_ids):
+            capacity = 2 * row
+            self._row_ids = np.resize(self._row_ids, capacity)
+            self._row_status = np.resize(self._row_status, capacity)
+            self._row_score = np.resize(self._row_score, capacity)
+
+        self._row_ids[row] = account_id
+        self._row_status[row] = STATUS_CODES['observing']
+        self._row_score[row] = 0.0
+        self._id_to_row[account_id] = row
+        self._row_count += 1
+
+    def _set_status(self, account_id: int, status: str):
+        """更新列式存储中的账户状态"""
+        self._row_status[self._id_to_row[account_id]] = STATUS_CODES[status]
+
+    def _account_view(self, account_id: int) -> Dict[str, Any]:
+        """返回账户信息副本，状态与评分取自列式存储"""
+        row = self._id_to_row[account_id]
+        view = dict(self.accounts[account_id])
+        view['status'] = STATUS_NAMES[self._row_status[row]]
+        view['score'] = float(self._row_score[row])
+        return view
+
     def create_shadow_account(
         self,
         strategy_id: int,
@@ -87,12 +183,12 @@ class ShadowManager:
             'initial_cash': initial_cash,
             'current_value': initial_cash,
             'observation_days': observation_days,
-            'status': 'observing',  # observing/promoted/terminated
             'created_at': datetime.now().isoformat(),
             'metrics': {},
-            'daily_records': [],
-            'score': 0.0
+            'daily_records': []
         }
+        # 状态（observing/promoted/terminated）与评分存于列式存储
+        self._index_account(account_id)
 
         logger.info(f"创建影子账户", account_id=account_id, strategy_id=strategy_id)
 
@@ -106,9 +202,11 @@ class ShadowManager:
             account_id: 账户ID
 
         Returns:
-            账户信息
+            账户信息（副本）
         """
-        return self.accounts.get(account_id)
+        if account_id not in self.accounts:
+            return None
+        return self._account_view(account_id)
 
     def update_account_metrics(self, account_id: int, metrics: Dict[str, float]):
         """
@@ -118,14 +216,16 @@ class ShadowManager:
             account_id: 账户ID
             metrics: 指标字典
         """
-        if account_id not in self.accounts:
+        account = self.accounts.get(account_id)
+        if account is None:
             raise ValidationError(f"账户不存在: {account_id}")
 
-        self.accounts[account_id]['metrics'] = metrics
+        account['metrics'] = metrics
+        self._score_cache.pop(account_id, None)
 
         # 重新计算评分
         score = self.calculate_score(account_id)
-        self.accounts[account_id]['score'] = score
+        self._row_score[self._id_to_row[account_id]] = score
 
         logger.info(f"更新账户指标", account_id=account_id, score=score)
 
@@ -139,15 +239,21 @@ class ShadowManager:
         Returns:
             评分（0-100）
         """
-        if account_id not in self.accounts:
+        account = self.accounts.get(account_id)
+        if account is None:
             raise ValidationError(f"账户不存在: {account_id}")
 
-        account = self.accounts[account_id]
         metrics = account.get('metrics', {})
 
         if not metrics:
             return 0.0
 
+        # 指标与权重均未变化时直接复用上次结果
+        key = (frozenset(metrics.items()), self._weights_key)
+        cached = self._score_cache.get(account_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
         # 各维度归一化评分
         scores = {}
 
@@ -173,10 +279,27 @@ class ShadowManager:
 
         # 加权求和
         total_score = 0.0
-        for metric, weight in self.score_weights.items():
+        for metric, weight in self._score_weights.items():
             total_score += scores.get(metric, 0) * weight
 
-        return round(total_score, 2)
+        total_score = round(total_score, 2)
+        self._score_cache[account_id] = (key, total_score)
+
+        return total_score
+
+    def set_score_weights(self, weights: Dict[str, float]):
+        """
+        设置评分权重
+
+        Args:
+            weights: 各维度权重
+        """
+        self._score_weights = dict(weights)
+        self._score_weights_view = MappingProxyType(self._score_weights)
+        self._weights_key = tuple(sorted(self._score_weights.items()))
+
+        # 评分缓存 {account_id: ((指标, 权重), 评分)}
+        self._score_cache: Dict[int, Tuple[Tuple[frozenset, tuple], float]] = {}
 
     def _calculate_time_weight(self, days: int) -> float:
         """
@@ -188,8 +311,10 @@ class ShadowManager:
         Returns:
             权重（0-1）
         """
-        # 指数衰减公式: weight = 0.5 ^ (days / halflife)
-        return 0.5 ** (days / self.time_decay_halflife)
+        # 一年内查表，其余按指数衰减公式: weight = 0.5 ^ (days / halflife)
+        if 0 <= days < self.TIME_WEIGHT_LUT_DAYS:
+            return float(self._time_weight_lut[days])
+        return 0.5 ** (days / self._time_decay_halflife)
 
     def add_daily_record(self, account_id: int, record: Dict[str, Any]):
         """
@@ -199,10 +324,20 @@ class ShadowManager:
             account_id: 账户ID
             record: 每日记录
         """
-        if account_id not in self.accounts:
+        account = self.accounts.get(account_id)
+        if account is None:
             raise ValidationError(f"账户不存在: {account_id}")
 
-        self.accounts[account_id]['daily_records'].append(record)
+        # 日期只在写入时解析一次，解析失败时两份记录都不修改
+        record_date = np.datetime64(record['date'], 'D')
+        record_return = float(record.get('return', 0))
+
+        account['daily_records'].append(record)
+
+        series = self._daily_series.get(account_id)
+        if series is None:
+            series = self._daily_series[account_id] = _DailySeries()
+        series.append(record_date, record_return)
 
     def _calculate_weighted_return(self, account_id: int) -> float:
         """
@@ -217,29 +352,25 @@ class ShadowManager:
         if account_id not in self.accounts:
             return 0.0
 
-        account = self.accounts[account_id]
-        daily_records = account.get('daily_records', [])
-
-        if not daily_records:
+        series = self._daily_series.get(account_id)
+        if series is None or series.size == 0:
             return 0.0
 
-        # 计算加权平均
-        today = datetime.now()
-        weighted_sum = 0.0
-        weight_sum = 0.0
+        # 计算加权平均（权重 = 0.5 ^ (距今天数 / 半衰期)），一年内查表
+        today = np.datetime64(date.today(), 'D')
+        days_ago = (today - series.dates[:series.size]).astype(np.int64)
+        weights = self._time_weight_lut[np.clip(days_ago, 0, self.TIME_WEIGHT_LUT_DAYS - 1)]
 
-        for record in daily_records:
-            record_date = datetime.strptime(record['date'], '%Y-%m-%d')
-            days_ago = (today - record_date).days
-
-            weight = self._calculate_time_weight(days_ago)
-            weighted_sum += record.get('return', 0) * weight
-            weight_sum += weight
+        # 超出查表范围（含未来日期）的按公式计算
+        out_of_range = (days_ago < 0) | (days_ago >= self.TIME_WEIGHT_LUT_DAYS)
+        if out_of_range.any():
+            weights[out_of_range] = np.exp2(-days_ago[out_of_range] / self._time_decay_halflife)
 
+        weight_sum = weights.sum()
         if weight_sum == 0:
             return 0.0
 
-        return weighted_sum / weight_sum
+        return float(np.dot(series.returns[:series.size], weights) / weight_sum)
 
     def get_top_strategies(
         self,
@@ -254,29 +385,27 @@ class ShadowManager:
             min_score: 最低分数
 
         Returns:
-            策略列表
+            策略列表（账户信息副本）
         """
-        # 筛选观察中的账户
-        observing_accounts = [
-            acc for acc in self.accounts.values()
-            if acc['status'] == 'observing'
-        ]
-
-        # 过滤低分账户
-        qualified_accounts = [
-            acc for acc in observing_accounts
-            if acc.get('score', 0) >= min_score
-        ]
-
-        # 按分数降序排列
-        sorted_accounts = sorted(
-            qualified_accounts,
-            key=lambda x: x.get('score', 0),
-            reverse=True
+        if limit <= 0:
+            return []
+
+        # 在列式索引上筛选观察中且达标的账户
+        n = self._row_count
+        scores = self._row_score[:n]
+        rows = np.flatnonzero(
+            (self._row_status[:n] == STATUS_CODES['observing']) & (scores >= min_score)
         )
 
-        # 返回Top N
-        return sorted_accounts[:limit]
+        # 候选较多时先用partition截取第limit名及以上（含并列）
+        if len(rows) > limit:
+            kth_score = np.partition(scores[rows], len(rows) - limit)[len(rows) - limit]
+            rows = rows[scores[rows] >= kth_score]
+
+        # 按分数降序，同分按创建顺序
+        rows = rows[np.lexsort((rows, -scores[rows]))][:limit]
+
+        return [self._account_view(int(account_id)) for account_id in self._row_ids[rows]]
 
     def check_promotion_eligibility(self, account_id: int) -> bool:
         """
@@ -288,13 +417,12 @@ class ShadowManager:
         Returns:
             是否符合晋升条件
         """
-        if account_id not in self.accounts:
+        account = self.accounts.get(account_id)
+        if account is None:
             return False
 
-        account = self.accounts[account_id]
-
         # 条件1：分数 >= 35
-        score = account.get('score', 0)
+        score = self._row_score[self._id_to_row[account_id]]
         if score < self.promotion_min_score:
             return False
 
@@ -319,8 +447,9 @@ class ShadowManager:
             logger.warning(f"不符合晋升条件", account_id=account_id)
             return False
 
-        self.accounts[account_id]['status'] = 'promoted'
-        self.accounts[account_id]['promoted_at'] = datetime.now().isoformat()
+        account = self.accounts[account_id]
+        self._set_status(account_id, 'promoted')
+        account['promoted_at'] = datetime.now().isoformat()
 
         logger.info(f"账户晋升到实盘", account_id=account_id)
 
@@ -334,8 +463,9 @@ class ShadowManager:
             account_id: 账户ID
             days: 天数
         """
-        if account_id in self.accounts:
-            self.accounts[account_id]['observation_days'] = days
+        account = self.accounts.get(account_id)
+        if account is not None:
+            account['observation_days'] = days
 
     def terminate_account(self, account_id: int, reason: str = ''):
         """
@@ -345,10 +475,11 @@ class ShadowManager:
             account_id: 账户ID
             reason: 终止原因
         """
-        if account_id in self.accounts:
-            self.accounts[account_id]['status'] = 'terminated'
-            self.accounts[account_id]['terminated_at'] = datetime.now().isoformat()
-            self.accounts[account_id]['termination_reason'] = reason
+        account = self.accounts.get(account_id)
+        if account is not None:
+            self._set_status(account_id, 'terminated')
+            account['terminated_at'] = datetime.now().isoformat()
+            account['termination_reason'] = reason
 
             logger.info(f"账户已终止", account_id=account_id, reason=reason)
 
@@ -369,10 +500,9 @@ class ShadowManager:
         Returns:
             回测结果
         """
-        if account_id not in self.accounts:
+        account = self.accounts.get(account_id)
+        if account is None:
             raise ValidationError(f"账户不存在: {account_id}")
-
-        account = self.accounts[account_id]
         initial_cash = account['initial_cash']
 
         # 使用回测引擎
@@ -409,37 +539,31 @@ class ShadowManager:
         Returns:
             每日结果列表
         """
-        if account_id not in self.accounts:
+        account = self.accounts.get(account_id)
+        if account is None:
             raise ValidationError(f"账户不存在: {account_id}")
-
-        account = self.accounts[account_id]
         initial_cash = account['initial_cash']
 
         daily_results = []
 
-        # 按天分段
-        for i in range(len(data)):
-            # 取从开始到当前天的数据
-            day_data = data.iloc[:i+1].copy()
+        # 单次逐K线回放，每天的结果等同于对截至当天的数据单独回测
+        engine = BacktestEngine(initial_cash=initial_cash, enable_china_rules=True)
 
-            if len(day_data) < 2:
+        for i, step in enumerate(engine.run_stepwise(
+            strategy_code=strategy_code,
+            data=data,
+            symbol='SH600000'
+        )):
+            # 至少需要2根K线
+            if i == 0:
                 continue
 
-            # 执行回测
-            engine = BacktestEngine(initial_cash=initial_cash, enable_china_rules=True)
-
-            result = engine.run(
-                strategy_code=strategy_code,
-                data=day_data,
-                symbol='SH600000'
-            )
-
             # 记录每日结果
             daily_result = {
-                'date': str(day_data.iloc[-1]['date']),
-                'value': result.get('final_value', initial_cash),
-                'return': result.get('total_return', 0),
-                'trades': result.get('total_trades', 0)
+                'date': str(step['date']),
+                'value': step['final_value'],
+                'return': step['total_return'],
+                'trades': step['total_trades']
             }
 
             daily_results.append(daily_result)
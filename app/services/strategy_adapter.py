@@ -10,15 +10,102 @@ CN5-Lite 策略适配器层
 """
 
 import ast
-import json
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from types import CodeType
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
 from app.logger import get_logger
 from app.errors import ValidationError, ExecutionError
 
 logger = get_logger(__name__)
 
 
+# 可直接JSON序列化的标量类型
+_JSON_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _is_json_safe(value: Any) -> bool:
+    """
+    按类型判断值能否JSON序列化（不实际序列化）
+
+    Args:
+        value: 任意值
+
+    Returns:
+        是否可序列化
+    """
+    if isinstance(value, _JSON_SCALAR_TYPES):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_json_safe(item) for item in value)
+    if isinstance(value, dict):
+        return all(
+            isinstance(k, _JSON_SCALAR_TYPES) and _is_json_safe(v)
+            for k, v in value.items()
+        )
+    return False
+
+
+@lru_cache(maxsize=4096)
+def _pack_date(date: Any) -> int:
+    """
+    将日期压缩为整数yyyymmdd，便于T+1比较
+
+    Args:
+        date: 日期（YYYY-MM-DD、YYYYMMDD等字符串，或pd.Timestamp/datetime/date）
+
+    Returns:
+        整数日期
+
+    Raises:
+        ValidationError: 无法识别的日期
+    """
+    # 常见的规范字符串直接切片（月、日越界时交给pandas报错）
+    if isinstance(date, str):
+        digits = date
+        if len(date) == 10 and date[4] == date[7] == '-':
+            digits = date[:4] + date[5:7] + date[8:10]
+
+        if len(digits) == 8 and digits.isdigit():
+            day = int(digits)
+            if 1 <= day // 100 % 100 <= 12 and 1 <= day % 100 <= 31:
+                return day
+
+    # 其他格式（非补零字符串、Timestamp、datetime、date）交给pandas解析
+    try:
+        ts = pd.Timestamp(date)
+    except (TypeError, ValueError) as e:
+        raise ValidationError(f"无法识别的日期: {date!r}") from e
+
+    if pd.isna(ts):
+        raise ValidationError(f"无法识别的日期: {date!r}")
+
+    return ts.year * 10000 + ts.month * 100 + ts.day
+
+
+def _unpack_date(day: Optional[int]) -> Optional[str]:
+    """将整数yyyymmdd还原为YYYY-MM-DD"""
+    if day is None:
+        return None
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+
+@lru_cache(maxsize=256)
+def _compile_strategy_code(code: str) -> CodeType:
+    """
+    编译策略代码（按源码缓存，同一策略重复实例化时跳过解析和编译）
+
+    Args:
+        code: 策略代码
+
+    Returns:
+        代码对象
+    """
+    return compile(code, '<strategy>', 'exec')
+
+
 # ==================
 # 标准策略封装
 # ==================
@@ -53,14 +140,10 @@ class StandardStrategy:
 
         try:
             # 执行代码
-            exec(self.code, namespace)
+            exec(_compile_strategy_code(self.code), namespace)
 
             # 找到策略类
-            strategy_class = None
-            for name, obj in namespace.items():
-                if isinstance(obj, type) and hasattr(obj, 'on_bar'):
-                    strategy_class = obj
-                    break
+            strategy_class = self._find_strategy_class(namespace)
 
             if not strategy_class:
                 raise ValidationError("未找到包含on_bar方法的策略类")
@@ -74,6 +157,34 @@ class StandardStrategy:
             logger.error(f"策略初始化失败: {e}")
             raise ExecutionError(f"策略初始化失败: {e}")
 
+    @staticmethod
+    def _find_strategy_class(namespace: Dict[str, Any]) -> Optional[type]:
+        """
+        查找策略类
+
+        优先取名为Strategy的类或__strategy__指定的类，否则扫描命名空间。
+
+        Args:
+            namespace: 策略代码执行后的命名空间
+
+        Returns:
+            策略类或None
+        """
+        declared = namespace.get('__strategy__')
+        if isinstance(declared, str):
+            declared = namespace.get(declared)
+
+        for candidate in (namespace.get('Strategy'), declared):
+            if isinstance(candidate, type) and hasattr(candidate, 'on_bar'):
+                return candidate
+
+        # 兼容任意类名
+        for obj in namespace.values():
+            if isinstance(obj, type) and hasattr(obj, 'on_bar'):
+                return obj
+
+        return None
+
     def on_bar(self, bar: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         处理K线数据
@@ -102,13 +213,8 @@ class StandardStrategy:
         state = {}
         for key, value in self.strategy_instance.__dict__.items():
             if not key.startswith('_'):
-                # 尝试序列化
-                try:
-                    json.dumps(value)
-                    state[key] = value
-                except (TypeError, ValueError):
-                    # 无法序列化的对象转为字符串
-                    state[key] = str(value)
+                # 按类型判断，无法序列化的对象转为字符串
+                state[key] = value if _is_json_safe(value) else str(value)
 
         return state
 
@@ -152,12 +258,12 @@ class StrategyAdapter:
         self.strategy_id = strategy_id
         self.strategy = StandardStrategy(strategy_code)
 
-        # T+1锁定管理
-        # 格式: {symbol: {'amount': 100, 'lock_date': '2024-01-01'}}
-        self.t1_locks: Dict[str, Dict[str, Any]] = {}
+        # T+1锁定管理（按字段拆分为两个并行字典）
+        self._lock_amount: Dict[str, int] = {}  # {symbol: 锁定数量}
+        self._lock_date: Dict[str, int] = {}    # {symbol: 锁定日期yyyymmdd}
 
-        # 当前日期（用于T+1判断）
-        self.current_date: Optional[str] = None
+        # 当前日期（用于T+1判断，同时维护整数形式）
+        self.current_date = None
 
         logger.info(f"策略适配器初始化完成", strategy_id=strategy_id)
 
@@ -176,31 +282,107 @@ class StrategyAdapter:
             self._update_current_date(bar['date'])
 
         # 调用策略
-        signal = self.strategy.on_bar(bar)
+        return self._handle_signal(self.strategy.on_bar(bar), bar)
+
+    def process_bars(self, bars: pd.DataFrame) -> List[Optional[Dict[str, Any]]]:
+        """
+        批量处理K线数据
 
-        # 如果没有信号，返回None
+        日期格式化和日期变化判断在整列上一次完成，逐行只调用策略on_bar；
+        T+1锁定立即生效，锁定日志在批次结束时合并输出一条。
+        date列先统一转换为字符串（日期类型按'YYYY-MM-DD'格式化），策略收到的
+        bar['date']、订单中的date和current_date均为该字符串；date列本身为字符串时，
+        结果与逐根调用process_bar相同。
+
+        Args:
+            bars: K线数据（DataFrame，可含date列）
+
+        Returns:
+            每根K线对应的信号/订单或None
+        """
+        records = bars.to_dict('records')
+        locked: List[Dict[str, Any]] = []
+
+        if not records or 'date' not in bars.columns:
+            results = [self._handle_signal(self.strategy.on_bar(bar), bar, locked) for bar in records]
+            self._log_t1_locks(locked)
+            return results
+
+        # 日期统一为字符串，并标记日期变化的行
+        date_col = bars['date']
+        if pd.api.types.is_datetime64_any_dtype(date_col):
+            dates = date_col.dt.strftime('%Y-%m-%d').to_numpy()
+        else:
+            dates = date_col.astype(str).to_numpy()
+
+        changed = np.empty(len(dates), dtype=bool)
+        changed[0] = dates[0] != self.current_date
+        changed[1:] = dates[1:] != dates[:-1]
+
+        results = []
+        for bar, date, date_changed in zip(records, dates, changed):
+            bar['date'] = date
+            if date_changed:
+                self._update_current_date(date)
+
+            results.append(self._handle_signal(self.strategy.on_bar(bar), bar, locked))
+
+        self._log_t1_locks(locked)
+        return results
+
+    def _handle_signal(
+        self,
+        signal: Optional[Dict[str, Any]],
+        bar: Dict[str, Any],
+        locked: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        将策略信号转换为订单（含T+1检查）
+
+        Args:
+            signal: 策略信号
+            bar: K线数据
+            locked: 批量处理时收集新增锁定的订单（延后统一记录日志）
+
+        Returns:
+            订单、原样返回的信息或None
+        """
+        # 如果没有信号，返回None（绝大多数K线走此分支）
         if signal is None:
             return None
 
         # 如果signal不包含action，直接返回（可能是状态信息）
-        if not isinstance(signal, dict) or 'action' not in signal:
+        try:
+            action = signal['action']
+        except (TypeError, KeyError, IndexError):
             return signal
 
         # 验证订单
         order = self._validate_and_build_order(signal, bar)
+        if not order:
+            return order
 
         # 如果是买入，添加T+1锁定
-        if order and order.get('action') == 'buy':
-            self._add_t1_lock(order)
+        if action == 'buy':
+            self._add_t1_lock(order, locked)
 
         # 如果是卖出，检查T+1限制
-        if order and order.get('action') == 'sell':
-            if not self._check_t1_sellable(order):
-                logger.warning(f"T+1限制：当日买入不可卖出", symbol=order.get('symbol'))
-                return None
+        elif action == 'sell' and not self._check_t1_sellable(order):
+            logger.warning(f"T+1限制：当日买入不可卖出", symbol=order['symbol'])
+            return None
 
         return order
 
+    @property
+    def current_date(self) -> Optional[str]:
+        """当前日期"""
+        return self._current_date
+
+    @current_date.setter
+    def current_date(self, date: Optional[str]):
+        self._current_date = date
+        self._current_day = _pack_date(date) if date else None
+
     def _update_current_date(self, date: str):
         """更新当前日期并清理过期T+1锁定"""
         old_date = self.current_date
@@ -217,11 +399,14 @@ class StrategyAdapter:
         Args:
             current_date: 当前日期
         """
-        unlocked = []
-        for symbol, lock_info in list(self.t1_locks.items()):
-            if lock_info['lock_date'] < current_date:
-                unlocked.append(symbol)
-                del self.t1_locks[symbol]
+        current_day = _pack_date(current_date)
+        unlocked = [
+            symbol for symbol, lock_day in self._lock_date.items()
+            if lock_day < current_day
+        ]
+        for symbol in unlocked:
+            del self._lock_date[symbol]
+            del self._lock_amount[symbol]
 
         if unlocked:
             logger.info(f"T+1解锁", symbols=unlocked, date=current_date)
@@ -244,21 +429,16 @@ class StrategyAdapter:
         if action not in ['buy', 'sell']:
             return None
 
-        # 提取订单字段
+        # 合并信号字段，缺省值在前、适配器字段在后覆盖
         order = {
-            'action': action,
-            'symbol': signal.get('symbol', ''),
-            'amount': signal.get('amount', 0),
+            'symbol': '',
+            'amount': 0,
+            **signal,
             'price': signal.get('price', bar.get('close')),
             'strategy_id': self.strategy_id,
             'date': self.current_date
         }
 
-        # 复制其他字段
-        for key, value in signal.items():
-            if key not in order:
-                order[key] = value
-
         # 验证买入数量必须是100的倍数
         if action == 'buy':
             if order['amount'] % 100 != 0:
@@ -266,27 +446,46 @@ class StrategyAdapter:
 
         return order
 
-    def _add_t1_lock(self, order: Dict[str, Any]):
+    def _add_t1_lock(self, order: Dict[str, Any], locked: Optional[List[Dict[str, Any]]] = None):
         """
         添加T+1锁定
 
         Args:
             order: 买入订单
+            locked: 不为None时只收集订单，由调用方合并记录日志
         """
         symbol = order['symbol']
         amount = order['amount']
         date = order['date']
 
-        if symbol in self.t1_locks:
+        if symbol in self._lock_amount:
             # 累加锁定数量
-            self.t1_locks[symbol]['amount'] += amount
+            self._lock_amount[symbol] += amount
         else:
-            self.t1_locks[symbol] = {
-                'amount': amount,
-                'lock_date': date
-            }
+            self._lock_amount[symbol] = amount
+            self._lock_date[symbol] = _pack_date(date) if date else None
 
-        logger.info(f"T+1锁定", symbol=symbol, amount=amount, date=date)
+        if locked is None:
+            logger.info(f"T+1锁定", symbol=symbol, amount=amount, date=date)
+        else:
+            locked.append(order)
+
+    @staticmethod
+    def _log_t1_locks(locked: List[Dict[str, Any]]):
+        """
+        合并记录一批T+1锁定
+
+        Args:
+            locked: 本批次新增锁定的买入订单
+        """
+        if locked:
+            logger.info(
+                f"T+1锁定",
+                count=len(locked),
+                symbols=sorted({order['symbol'] for order in locked}),
+                amount=sum(order['amount'] for order in locked),
+                date=locked[-1]['date']
+            )
 
     def _check_t1_sellable(self, order: Dict[str, Any]) -> bool:
         """
@@ -298,24 +497,10 @@ class StrategyAdapter:
         Returns:
             是否可以卖出
         """
-        symbol = order['symbol']
-        amount = order['amount']
+        lock_date = self._lock_date.get(order['symbol'])
 
-        # 如果没有T+1锁定，可以卖出
-        if symbol not in self.t1_locks:
-            return True
-
-        lock_info = self.t1_locks[symbol]
-
-        # 如果锁定日期 < 当前日期，已解锁，可以卖出
-        if lock_info['lock_date'] < self.current_date:
-            return True
-
-        # 如果锁定日期 == 当前日期，不可卖出
-        if lock_info['lock_date'] == self.current_date:
-            return False
-
-        return True
+        # 没有T+1锁定或锁定日期不是当日（已解锁），可以卖出；当日锁定不可卖出
+        return lock_date is None or lock_date != self._current_day
 
     def is_locked(self, symbol: str) -> bool:
         """
@@ -327,13 +512,9 @@ class StrategyAdapter:
         Returns:
             是否锁定
         """
-        if symbol not in self.t1_locks:
-            return False
-
-        lock_info = self.t1_locks[symbol]
-
         # 如果锁定日期 == 当前日期，锁定中
-        return lock_info['lock_date'] == self.current_date
+        lock_date = self._lock_date.get(symbol)
+        return lock_date is not None and lock_date == self._current_day
 
     def get_locked_amount(self, symbol: str) -> int:
         """
@@ -345,10 +526,28 @@ class StrategyAdapter:
         Returns:
             锁定数量
         """
-        if symbol not in self.t1_locks:
-            return 0
+        return self._lock_amount.get(symbol, 0)
+
+    @property
+    def t1_locks(self) -> Dict[str, Dict[str, Any]]:
+        """
+        T+1锁定表（持久化格式）
+
+        Returns:
+            {symbol: {"amount": 100, "lock_date": "2024-01-01"}}
+        """
+        return {
+            symbol: {'amount': amount, 'lock_date': _unpack_date(self._lock_date[symbol])}
+            for symbol, amount in self._lock_amount.items()
+        }
 
-        return self.t1_locks[symbol]['amount']
+    @t1_locks.setter
+    def t1_locks(self, locks: Dict[str, Dict[str, Any]]):
+        self._lock_amount = {symbol: info['amount'] for symbol, info in locks.items()}
+        self._lock_date = {
+            symbol: _pack_date(info['lock_date']) if info['lock_date'] else None
+            for symbol, info in locks.items()
+        }
 
     def get_state(self) -> Dict[str, Any]:
         """
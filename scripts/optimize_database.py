@@ -4,116 +4,182 @@
 
 运行方式：
   python scripts/optimize_database.py
+  python scripts/optimize_database.py --quick   # 附带快速完整性检查
+  python scripts/optimize_database.py --deep    # 附带完整完整性检查
 """
 
 import sqlite3
 import os
 import sys
+from contextlib import closing
+from functools import lru_cache
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import get_db_path
 
+# 路径解析会读取环境变量并创建目录，脚本内只做一次
+get_db_path = lru_cache(maxsize=1)(get_db_path)
 
-def optimize_database():
-    """优化SQLite数据库"""
-    db_path = get_db_path()
+# ANALYZE每个索引最多扫描的行数
+ANALYSIS_LIMIT = 1000
 
-    print(f"\n{'='*60}")
-    print("CN5-Lite 数据库优化工具")
-    print(f"{'='*60}")
-    print(f"数据库路径: {db_path}")
+# 空闲页占比超过该值才执行VACUUM
+VACUUM_FREELIST_RATIO = 0.10
 
-    if not os.path.exists(db_path):
-        print("❌ 数据库文件不存在")
-        return
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # 1. 分析数据库
-    print("\n步骤1: 分析数据库...")
-    cursor.execute("ANALYZE")
-    print("✅ 数据库分析完成")
-
-    # 2. 清理vacuum
-    print("\n步骤2: 清理vacuum...")
-    initial_size = os.path.getsize(db_path) / 1024 / 1024  # MB
-    print(f"   初始大小: {initial_size:.2f}MB")
-
-    cursor.execute("VACUUM")
-
-    final_size = os.path.getsize(db_path) / 1024 / 1024  # MB
-    saved = initial_size - final_size
-    print(f"   优化后: {final_size:.2f}MB")
-    print(f"   节省: {saved:.2f}MB ({saved/initial_size*100:.1f}%)")
-
-    # 3. 创建索引
-    print("\n步骤3: 创建/优化索引...")
-
-    indexes = [
-        ("idx_strategies_status", "strategies", "status"),
-        ("idx_strategies_created", "strategies", "created_at"),
-        ("idx_backtest_strategy", "backtest_results", "strategy_id"),
-        ("idx_backtest_date", "backtest_results", "start_date, end_date"),
-        ("idx_trades_symbol", "trades", "symbol"),
-        ("idx_trades_date", "trades", "trade_time"),
-        ("idx_trades_strategy", "trades", "strategy_id"),
-        ("idx_shadow_status", "shadow_accounts", "status"),
-        ("idx_shadow_ranking", "shadow_accounts", "ranking"),
-        ("idx_shadow_score", "shadow_accounts", "weighted_score DESC"),
-    ]
-
-    for idx_name, table, columns in indexes:
-        try:
-            cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {table}({columns})")
-            print(f"   ✅ {idx_name}")
-        except sqlite3.Error as e:
-            print(f"   ⚠️  {idx_name}: {e}")
+def run_statements(conn: sqlite3.Connection, statements, transaction: bool = False):
+    """
+    一次executescript批量执行SQL，出错时退回逐条执行以定位问题语句
 
-    # 4. 优化配置
-    print("\n步骤4: 优化配置...")
+    Args:
+        conn: 数据库连接
+        statements: [(SQL, 描述)]
+        transaction: 是否放在同一个事务中执行（一次提交）
+    """
+    script = ";\n".join(sql for sql, _ in statements) + ";"
+    if transaction:
+        script = f"BEGIN IMMEDIATE;\n{script}\nCOMMIT;"
+
+    try:
+        conn.executescript(script)
+        for _, desc in statements:
+            print(f"   ✅ {desc}")
+        return
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.rollback()
+        print(f"   ⚠️  批量执行失败（{e}），改为逐条执行")
 
-    optimizations = [
-        ("PRAGMA journal_mode=WAL", "启用WAL模式"),
-        ("PRAGMA synchronous=NORMAL", "设置同步模式"),
-        ("PRAGMA cache_size=-64000", "设置缓存64MB"),
-        ("PRAGMA temp_store=MEMORY", "临时存储在内存"),
-        ("PRAGMA mmap_size=268435456", "启用内存映射256MB"),
-    ]
+    # 语句均幂等，逐条重试（单条失败不影响其余语句）
+    if transaction:
+        conn.execute("BEGIN IMMEDIATE")
 
-    for pragma, desc in optimizations:
+    for sql, desc in statements:
         try:
-            cursor.execute(pragma)
+            conn.execute(sql)
             print(f"   ✅ {desc}")
         except sqlite3.Error as e:
             print(f"   ⚠️  {desc}: {e}")
 
-    # 5. 统计信息
-    print("\n步骤5: 数据库统计...")
+    if transaction:
+        conn.commit()
 
-    tables = ['strategies', 'backtest_results', 'trades', 'shadow_accounts']
 
-    for table in tables:
-        try:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = cursor.fetchone()[0]
-            print(f"   {table}: {count}条记录")
-        except sqlite3.Error:
-            print(f"   {table}: 表不存在")
+def optimize_database(deep: bool = False, quick: bool = False):
+    """
+    优化SQLite数据库
 
-    # 6. 完整性检查
-    print("\n步骤6: 完整性检查...")
-    cursor.execute("PRAGMA integrity_check")
-    result = cursor.fetchone()[0]
+    完整性检查需要扫描全部页面，默认跳过。
 
-    if result == "ok":
-        print("   ✅ 数据库完整性正常")
-    else:
-        print(f"   ❌ 数据库完整性问题: {result}")
+    Args:
+        deep: 执行完整的integrity_check
+        quick: 执行quick_check（跳过索引与UNIQUE约束校验，更快）
+    """
+    db_path = get_db_path()
 
-    conn.commit()
-    conn.close()
+    print(f"\n{'='*60}")
+    print("CN5-Lite 数据库优化工具")
+    print(f"{'='*60}")
+    print(f"数据库路径: {db_path}")
+
+    if not os.path.exists(db_path):
+        print("❌ 数据库文件不存在")
+        return
+
+    # 自动提交模式，事务由run_statements显式控制；退出时关闭连接
+    with closing(sqlite3.connect(db_path, isolation_level=None)) as conn:
+        # 1. 分析数据库（PRAGMA optimize只分析统计信息过期的表）
+        print("\n步骤1: 分析数据库...")
+        conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+        planned = conn.execute("PRAGMA optimize(-1)").fetchall()
+        for (statement,) in planned:
+            print(f"   {statement}")
+        conn.execute("PRAGMA optimize=0x10002")
+        print(f"✅ 数据库分析完成（{len(planned)}项）" if planned else "✅ 统计信息已是最新")
+
+        # 2. 清理vacuum（仅在空闲页占比较高时执行）
+        print("\n步骤2: 清理vacuum...")
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        freelist_ratio = freelist_count / page_count if page_count else 0.0
+
+        if freelist_ratio > VACUUM_FREELIST_RATIO:
+            initial_size = os.path.getsize(db_path) / 1024 / 1024  # MB
+            print(f"   初始大小: {initial_size:.2f}MB（空闲页{freelist_ratio:.1%}）")
+
+            conn.execute("VACUUM")
+
+            final_size = os.path.getsize(db_path) / 1024 / 1024  # MB
+            saved = initial_size - final_size
+            print(f"   优化后: {final_size:.2f}MB")
+            print(f"   节省: {saved:.2f}MB ({saved/initial_size*100:.1f}%)")
+        else:
+            print(f"   ⏭️  空闲页{freelist_ratio:.1%}，低于{VACUUM_FREELIST_RATIO:.0%}，跳过")
+
+        # 3. 优化配置（先启用WAL，后续建索引不再逐条同步刷盘）
+        print("\n步骤3: 优化配置...")
+
+        optimizations = [
+            ("PRAGMA journal_mode=WAL", "启用WAL模式"),
+            ("PRAGMA synchronous=NORMAL", "设置同步模式"),
+            ("PRAGMA cache_size=-64000", "设置缓存64MB"),
+            ("PRAGMA temp_store=MEMORY", "临时存储在内存"),
+            ("PRAGMA mmap_size=268435456", "启用内存映射256MB"),
+        ]
+
+        run_statements(conn, optimizations)
+
+        # 4. 创建索引（同一事务内一次提交）
+        print("\n步骤4: 创建/优化索引...")
+
+        indexes = [
+            ("idx_strategies_created", "strategies", "created_at"),
+            ("idx_backtest_strategy", "backtest_results", "strategy_id"),
+            ("idx_backtest_created", "backtest_results", "created_at"),
+            ("idx_trades_symbol", "trades", "symbol"),
+            ("idx_trades_date", "trades", "date"),
+            ("idx_trades_strategy", "trades", "strategy_id"),
+            ("idx_shadow_status", "shadow_accounts", "status"),
+            # 排名只在观察中的账户间进行，部分索引更小
+            ("idx_shadow_score_observing", "shadow_accounts", "score DESC", "status = 'observing'"),
+        ]
+
+        run_statements(conn, [
+            (
+                f"CREATE INDEX IF NOT EXISTS {idx_name} ON {table}({columns})"
+                + (f" WHERE {where[0]}" if where else ""),
+                idx_name
+            )
+            for idx_name, table, columns, *where in indexes
+        ], transaction=True)
+
+        # 让查询规划器拿到新索引的统计信息
+        conn.execute("PRAGMA optimize")
+
+        # 5. 统计信息
+        print("\n步骤5: 数据库统计...")
+
+        tables = ['strategies', 'backtest_results', 'trades', 'shadow_accounts']
+
+        for table in tables:
+            try:
+                count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                print(f"   {table}: {count}条记录")
+            except sqlite3.Error:
+                print(f"   {table}: 表不存在")
+
+        # 6. 完整性检查（可选）
+        print("\n步骤6: 完整性检查...")
+        if deep or quick:
+            result = conn.execute("PRAGMA integrity_check" if deep else "PRAGMA quick_check").fetchone()[0]
+
+            if result == "ok":
+                print("   ✅ 数据库完整性正常")
+            else:
+                print(f"   ❌ 数据库完整性问题: {result}")
+        else:
+            print("   ⏭️  已跳过（使用 --quick 或 --deep 执行）")
 
     print(f"\n{'='*60}")
     print("✅ 数据库优化完成")
@@ -128,35 +194,28 @@ def show_database_info():
         print("数据库文件不存在")
         return
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    print("\n数据库信息:")
-    print("-" * 60)
-
-    # 表列表
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = cursor.fetchall()
-    print(f"表数量: {len(tables)}")
-    for table in tables:
-        print(f"  - {table[0]}")
+    with closing(sqlite3.connect(db_path)) as conn:
+        print("\n数据库信息:")
+        print("-" * 60)
 
-    # 索引列表
-    print("\n索引:")
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
-    indexes = cursor.fetchall()
-    for idx in indexes:
-        print(f"  - {idx[0]}")
+        # 表列表
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+        print(f"表数量: {len(tables)}")
+        for table in tables:
+            print(f"  - {table[0]}")
 
-    # 配置
-    print("\n当前配置:")
-    configs = ['journal_mode', 'synchronous', 'cache_size', 'temp_store']
-    for config in configs:
-        cursor.execute(f"PRAGMA {config}")
-        value = cursor.fetchone()[0]
-        print(f"  {config}: {value}")
+        # 索引列表
+        print("\n索引:")
+        indexes = conn.execute("SELECT name FROM sqlite_master WHERE type='index'").fetchall()
+        for idx in indexes:
+            print(f"  - {idx[0]}")
 
-    conn.close()
+        # 配置
+        print("\n当前配置:")
+        configs = ['journal_mode', 'synchronous', 'cache_size', 'temp_store']
+        for config in configs:
+            value = conn.execute(f"PRAGMA {config}").fetchone()[0]
+            print(f"  {config}: {value}")
 
 
 if __name__ == '__main__':
@@ -165,10 +224,12 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='数据库优化工具')
     parser.add_argument('--info', action='store_true', help='显示数据库信息')
     parser.add_argument('--optimize', action='store_true', help='优化数据库')
+    parser.add_argument('--quick', action='store_true', help='优化后执行quick_check快速完整性检查')
+    parser.add_argument('--deep', action='store_true', help='优化后执行integrity_check完整完整性检查')
 
     args = parser.parse_args()
 
     if args.info:
         show_database_info()
     elif args.optimize or (not args.info and not args.optimize):
-        optimize_database()
+        optimize_database(deep=args.deep, quick=args.quick)
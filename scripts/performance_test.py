@@ -6,8 +6,11 @@
   python scripts/performance_test.py
 """
 
+import csv
 import time
+import tracemalloc
 import psutil
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import sys
@@ -16,6 +19,11 @@ import os
 # 添加项目路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.services.strategy_adapter import StrategyAdapter
+from app.services.backtest_engine import BacktestEngine
+from app.services.risk_validator import RiskValidator
+from app.services.ai_generator import StrategyStorage
+
 
 class PerformanceTest:
     """性能测试工具"""
@@ -23,25 +31,50 @@ class PerformanceTest:
     def __init__(self):
         self.results = []
 
-    def measure_time(self, func, *args, **kwargs):
-        """测量函数执行时间"""
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        elapsed = end_time - start_time
-        return result, elapsed
+        # 测试数据只生成一次，各项测试复用
+        dates = pd.date_range(start='2024-01-01', end='2024-12-31', freq='D')
+        n = len(dates)
+        idx = np.arange(n, dtype='float64')
 
-    def measure_memory(self, func, *args, **kwargs):
-        """测量函数内存使用"""
-        process = psutil.Process()
-        mem_before = process.memory_info().rss / 1024 / 1024  # MB
+        # 递增序列（数据加载测试）
+        self.ramp_data = pd.DataFrame({
+            'date': dates,
+            'open': idx,
+            'high': idx,
+            'low': idx,
+            'close': idx,
+            'volume': idx
+        })
 
-        result = func(*args, **kwargs)
+        # 1年平价行情（回测测试）
+        self.flat_data = pd.DataFrame({
+            'date': dates,
+            'open': np.full(n, 10.0),
+            'high': np.full(n, 10.5),
+            'low': np.full(n, 9.5),
+            'close': np.full(n, 10.0),
+            'volume': np.full(n, 1000000, dtype='int64')
+        })
+
+    def measure(self, func, *args, **kwargs):
+        """
+        单次执行函数，同时测量耗时和内存峰值
 
-        mem_after = process.memory_info().rss / 1024 / 1024  # MB
-        mem_used = mem_after - mem_before
+        内存使用tracemalloc统计的分配峰值，不受RSS回收抖动影响。
+
+        Returns:
+            (结果, 耗时秒, 内存峰值MB)
+        """
+        tracemalloc.start()
+        try:
+            start_ns = time.perf_counter_ns()
+            result = func(*args, **kwargs)
+            elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
 
-        return result, mem_used
+        return result, elapsed, peak / 1024 / 1024
 
     def record_result(self, test_name, elapsed_time, memory_used, success=True):
         """记录测试结果"""
@@ -55,42 +88,38 @@ class PerformanceTest:
 
     def print_results(self):
         """打印测试结果"""
-        df = pd.DataFrame(self.results)
+        results = self.results
 
         print("\n" + "="*80)
         print("性能测试结果")
         print("="*80)
 
-        for _, row in df.iterrows():
+        for row in results:
             status = "✅" if row['success'] else "❌"
             print(f"\n{status} {row['test_name']}")
             print(f"   执行时间: {row['elapsed_time']:.3f}秒")
-            print(f"   内存使用: {row['memory_used_mb']:.2f}MB")
+            print(f"   内存峰值: {row['memory_used_mb']:.2f}MB")
 
         print("\n" + "="*80)
         print("统计摘要")
         print("="*80)
-        print(f"总测试数: {len(df)}")
-        print(f"成功: {df['success'].sum()}")
-        print(f"失败: {(~df['success']).sum()}")
-        print(f"总耗时: {df['elapsed_time'].sum():.3f}秒")
-        print(f"总内存: {df['memory_used_mb'].sum():.2f}MB")
-        print(f"平均耗时: {df['elapsed_time'].mean():.3f}秒")
+        total = len(results)
+        passed = sum(1 for row in results if row['success'])
+        total_time = sum(row['elapsed_time'] for row in results)
+        total_memory = sum(row['memory_used_mb'] for row in results)
+
+        print(f"总测试数: {total}")
+        print(f"成功: {passed}")
+        print(f"失败: {total - passed}")
+        print(f"总耗时: {total_time:.3f}秒")
+        print(f"总内存: {total_memory:.2f}MB")
+        print(f"平均耗时: {total_time / total if total else 0.0:.3f}秒")
 
     def test_data_loading(self):
         """测试数据加载性能"""
         print("\n测试1: 数据加载性能...")
 
-        # 生成测试数据
-        dates = pd.date_range(start='2024-01-01', end='2024-12-31', freq='D')
-        data = pd.DataFrame({
-            'date': dates,
-            'open': range(len(dates)),
-            'high': range(len(dates)),
-            'low': range(len(dates)),
-            'close': range(len(dates)),
-            'volume': range(len(dates))
-        })
+        data = self.ramp_data
 
         # 测试DataFrame操作
         def load_and_process():
@@ -99,8 +128,7 @@ class PerformanceTest:
             df['ma20'] = df['close'].rolling(20).mean()
             return df
 
-        result, elapsed = self.measure_time(load_and_process)
-        _, mem_used = self.measure_memory(load_and_process)
+        result, elapsed, mem_used = self.measure(load_and_process)
 
         self.record_result("数据加载和处理", elapsed, mem_used)
 
@@ -128,26 +156,26 @@ class MAStrategy:
         return None
 """
 
-        # 执行策略1000次
+        bars = [
+            {
+                'date': '2024-01-01',
+                'open': 10.0 + i * 0.01,
+                'high': 10.5 + i * 0.01,
+                'low': 9.5 + i * 0.01,
+                'close': 10.0 + i * 0.01,
+                'volume': 1000000
+            }
+            for i in range(1000)
+        ]
+
+        # 执行策略1000次（计时只覆盖process_bar）
         def run_strategy():
-            from app.services.strategy_adapter import StrategyAdapter
-
-            adapter = StrategyAdapter(strategy_code, strategy_id=1)
-
-            for i in range(1000):
-                bar = {
-                    'date': '2024-01-01',
-                    'open': 10.0 + i * 0.01,
-                    'high': 10.5 + i * 0.01,
-                    'low': 9.5 + i * 0.01,
-                    'close': 10.0 + i * 0.01,
-                    'volume': 1000000
-                }
+            for bar in bars:
                 adapter.process_bar(bar)
 
         try:
-            result, elapsed = self.measure_time(run_strategy)
-            _, mem_used = self.measure_memory(run_strategy)
+            adapter = StrategyAdapter(strategy_code, strategy_id=1)
+            result, elapsed, mem_used = self.measure(run_strategy)
 
             self.record_result("策略执行1000次", elapsed, mem_used)
         except Exception as e:
@@ -170,27 +198,14 @@ class SimpleStrategy:
         return None
 """
 
-        # 生成1年数据
-        dates = pd.date_range(start='2024-01-01', end='2024-12-31', freq='D')
-        data = pd.DataFrame({
-            'date': dates,
-            'open': [10.0] * len(dates),
-            'high': [10.5] * len(dates),
-            'low': [9.5] * len(dates),
-            'close': [10.0] * len(dates),
-            'volume': [1000000] * len(dates)
-        })
+        data = self.flat_data
 
         def run_backtest():
-            from app.services.backtest_engine import BacktestEngine
-
-            engine = BacktestEngine(initial_cash=100000, enable_china_rules=False)
-            result = engine.run(strategy_code, data, "TEST600000")
-            return result
+            return engine.run(strategy_code, data, "TEST600000")
 
         try:
-            result, elapsed = self.measure_time(run_backtest)
-            _, mem_used = self.measure_memory(run_backtest)
+            engine = BacktestEngine(initial_cash=100000, enable_china_rules=False)
+            result, elapsed, mem_used = self.measure(run_backtest)
 
             self.record_result("回测365天数据", elapsed, mem_used)
         except Exception as e:
@@ -201,24 +216,24 @@ class SimpleStrategy:
         """测试风控验证性能"""
         print("\n测试4: 风控验证性能...")
 
+        signals = [
+            {
+                'symbol': f'SH{600000 + i % 100}',
+                'action': 'buy',
+                'amount': 100,
+                'price': 10.0
+            }
+            for i in range(1000)
+        ]
+
+        # 验证1000笔交易
         def run_risk_validation():
-            from app.services.risk_validator import RiskValidator
-
-            validator = RiskValidator(total_capital=100000)
-
-            # 验证1000笔交易
-            for i in range(1000):
-                signal = {
-                    'symbol': f'SH{600000 + i % 100}',
-                    'action': 'buy',
-                    'amount': 100,
-                    'price': 10.0
-                }
+            for signal in signals:
                 validator.validate(signal)
 
         try:
-            result, elapsed = self.measure_time(run_risk_validation)
-            _, mem_used = self.measure_memory(run_risk_validation)
+            validator = RiskValidator(total_capital=100000)
+            result, elapsed, mem_used = self.measure(run_risk_validation)
 
             self.record_result("风控验证1000笔", elapsed, mem_used)
         except Exception as e:
@@ -230,10 +245,6 @@ class SimpleStrategy:
         print("\n测试5: 影子账户评分性能...")
 
         def run_shadow_scoring():
-            from app.services.shadow_manager import ShadowManager
-
-            manager = ShadowManager()
-
             # 模拟创建和评分10个账户
             for i in range(10):
                 # 简化测试，只测试评分逻辑
@@ -255,8 +266,7 @@ class SimpleStrategy:
                 )
 
         try:
-            result, elapsed = self.measure_time(run_shadow_scoring)
-            _, mem_used = self.measure_memory(run_shadow_scoring)
+            result, elapsed, mem_used = self.measure(run_shadow_scoring)
 
             self.record_result("影子账户评分10个", elapsed, mem_used)
         except Exception as e:
@@ -268,25 +278,22 @@ class SimpleStrategy:
         print("\n测试6: 数据库操作性能...")
 
         def run_db_operations():
-            from app.services.ai_generator import StrategyStorage
-
-            storage = StrategyStorage()
-
-            # 插入100条策略
-            for i in range(100):
-                storage.save({
+            # 插入100条策略（单个事务）
+            storage.save_many([
+                {
                     'name': f'PerfTestStrategy{i}',
                     'code': 'class S:\n    def on_bar(self, bar):\n        return None',
-                    'params': {},
-                    'status': 'draft'
-                })
+                    'params': {}
+                }
+                for i in range(100)
+            ])
 
             # 查询
-            strategies = storage.load_all(limit=100)
+            strategies = storage.list(limit=100)
 
         try:
-            result, elapsed = self.measure_time(run_db_operations)
-            _, mem_used = self.measure_memory(run_db_operations)
+            storage = StrategyStorage()
+            result, elapsed, mem_used = self.measure(run_db_operations)
 
             self.record_result("数据库操作100次", elapsed, mem_used)
         except Exception as e:
@@ -315,8 +322,10 @@ class SimpleStrategy:
         self.print_results()
 
         # 保存结果
-        df = pd.DataFrame(self.results)
-        df.to_csv('performance_results.csv', index=False)
+        with open('performance_results.csv', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.results[0]))
+            writer.writeheader()
+            writer.writerows(self.results)
         print(f"\n结果已保存到: performance_results.csv")
 
 
@@ -2,6 +2,7 @@
 # 提供Mock外部依赖、测试数据等
 
 import pytest
+import numpy as np
 import pandas as pd
 from unittest.mock import Mock, patch
 from datetime import datetime, timedelta
@@ -151,6 +152,30 @@ def sample_kline_data():
     })
 
 
+@pytest.fixture(scope="session")
+def mock_ohlcv_factory():
+    """
+    递增行情数据工厂（整个测试会话共用）
+
+    按列用numpy一次生成，每次调用返回新的DataFrame，测试可随意修改。
+
+    Returns:
+        函数 (n, start) -> 归一化格式的n天K线数据
+    """
+    def factory(n: int = 31, start: str = '2024-01-01') -> pd.DataFrame:
+        step = np.arange(n, dtype=np.float64) * 0.1
+        return pd.DataFrame({
+            'date': pd.date_range(start, periods=n, freq='D'),
+            'open': 10.0 + step,
+            'high': 10.5 + step,
+            'low': 9.5 + step,
+            'close': 10.0 + step,
+            'volume': np.full(n, 1000000, dtype=np.int64)
+        })
+
+    return factory
+
+
 @pytest.fixture
 def sample_kline_data_with_halt():
     """包含停牌的K线数据"""
@@ -274,8 +299,20 @@ def pytest_configure(config):
     )
 
 
+def pytest_addoption(parser):
+    """注册命令行选项"""
+    parser.addoption(
+        "--run-slow", action="store_true", default=False,
+        help="运行慢速测试（真实API调用）"
+    )
+
+
 def pytest_collection_modifyitems(config, items):
-    """自动跳过需要API密钥的测试（如果未提供）"""
+    """
+    自动跳过需要API密钥的测试（如果未提供）
+
+    慢速测试默认跳过，使用 --run-slow 或 -m slow 显式选择时才运行
+    """
     import os
 
     if not os.getenv('AI_API_KEY'):
@@ -283,3 +320,12 @@ def pytest_collection_modifyitems(config, items):
         for item in items:
             if "requires_api_key" in item.keywords:
                 item.add_marker(skip_api)
+
+    markexpr = config.getoption("markexpr")
+    run_slow = config.getoption("--run-slow") or ("slow" in markexpr and "not slow" not in markexpr)
+
+    if not run_slow:
+        skip_slow = pytest.mark.skip(reason="慢速测试，使用 --run-slow 运行")
+        for item in items:
+            if "slow" in item.keywords:
+                item.add_marker(skip_slow)
@@ -0,0 +1,33 @@
+"""
+集成测试共享fixture
+"""
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def storage():
+    """策略存储（整个测试会话共用，底层为同一个数据库连接）"""
+    from app.services.ai_generator import StrategyStorage
+
+    return StrategyStorage()
+
+
+@pytest.fixture(scope="session")
+def shadow_manager():
+    """影子账户管理器（整个测试会话共用，账户ID在各测试间连续分配）"""
+    from app.services.shadow_manager import ShadowManager
+
+    return ShadowManager()
+
+
+@pytest.fixture
+def trading_manager():
+    """
+    自动交易管理器
+
+    管理器持有已加载策略、运行状态等进程内状态，每个测试单独创建。
+    """
+    from app.services.ai_trading_manager import AITradingManager
+
+    return AITradingManager()
@@ -13,6 +13,48 @@ from app.api.main import app
 client = TestClient(app)
 
 
+@pytest.fixture(scope="module", autouse=True)
+def client_session():
+    """整个模块共用一个事件循环和应用生命周期，避免每个请求重建"""
+    with client:
+        yield
+
+
+@pytest.fixture(scope="module")
+def created_strategy_ids():
+    """收集测试中创建的策略ID，模块结束时一次批量删除"""
+    from app.services.ai_generator import StrategyStorage
+
+    strategy_ids = []
+
+    yield strategy_ids
+
+    if strategy_ids:
+        StrategyStorage().delete_many(strategy_ids)
+
+
+@pytest.fixture(scope="module")
+def minimal_strategy_id(created_strategy_ids):
+    """最简测试策略（交易、恢复、影子账户测试共用一个）"""
+    strategy_code = "class TestStrategy:\n    def on_bar(self, bar):\n        return None"
+
+    response = client.post(
+        "/api/v1/strategies",
+        json={
+            "name": "MinimalTestStrategy",
+            "code": strategy_code
+        }
+    )
+
+    if response.status_code != 200:
+        return None
+
+    strategy_id = response.json()["id"]
+    created_strategy_ids.append(strategy_id)
+
+    return strategy_id
+
+
 # ==================
 # 策略管理API测试
 # ==================
@@ -124,9 +166,9 @@ class TestStrategy:
 class TestBacktestAPI:
     """回测API集成测试"""
 
-    @pytest.fixture(autouse=True)
-    def setup_strategy(self):
-        """创建测试策略"""
+    @pytest.fixture(scope="class")
+    def backtest_strategy_id(self, created_strategy_ids):
+        """创建测试策略（整个测试类共用一个，模块结束时统一删除）"""
         strategy_code = """
 class MAStrategy:
     def __init__(self):
@@ -157,63 +199,65 @@ class MAStrategy:
             }
         )
 
-        if response.status_code == 200:
-            pytest.backtest_strategy_id = response.json()["id"]
+        if response.status_code != 200:
+            return None
+
+        strategy_id = response.json()["id"]
+        created_strategy_ids.append(strategy_id)
 
-        yield
+        return strategy_id
 
-        # 清理
-        if hasattr(pytest, "backtest_strategy_id"):
-            client.delete(f"/api/v1/strategies/{pytest.backtest_strategy_id}")
+    @pytest.fixture
+    def patched_data_source(self, monkeypatch, sample_kline_data):
+        """用固定K线数据替代真实数据源，回测结果可重复且无需联网"""
+        from app.services.multi_datasource import DataSourceManager
 
-    @pytest.mark.slow
-    def test_run_backtest(self):
+        monkeypatch.setattr(
+            DataSourceManager,
+            "fetch_with_fallback",
+            lambda self, symbol, start_date, end_date: sample_kline_data.copy()
+        )
+
+    def test_run_backtest(self, backtest_strategy_id, patched_data_source):
         """测试运行回测端点"""
-        if not hasattr(pytest, "backtest_strategy_id"):
+        if backtest_strategy_id is None:
             pytest.skip("策略创建失败")
 
         response = client.post(
             "/api/v1/backtest/run",
             json={
-                "strategy_id": pytest.backtest_strategy_id,
+                "strategy_id": backtest_strategy_id,
                 "symbol": "SH600000",
                 "start_date": "2024-01-01",
                 "end_date": "2024-01-31",
                 "initial_cash": 100000,
                 "enable_china_rules": True
             },
-            timeout=60
         )
 
-        # 回测可能需要真实数据，允许失败
-        if response.status_code == 200:
-            data = response.json().get("data", {})
+        assert response.status_code == 200
+        data = response.json()
 
-            assert "annual_return" in data
-            assert "sharpe_ratio" in data
-            assert "max_drawdown" in data
-        else:
-            pytest.skip("回测需要真实数据源")
+        assert "annual_return" in data
+        assert "sharpe_ratio" in data
+        assert "max_drawdown" in data
 
-    @pytest.mark.slow
-    def test_quick_backtest(self):
+    def test_quick_backtest(self, backtest_strategy_id, patched_data_source):
         """测试快速回测端点"""
-        if not hasattr(pytest, "backtest_strategy_id"):
+        if backtest_strategy_id is None:
             pytest.skip("策略创建失败")
 
         response = client.post(
             "/api/v1/backtest/quick",
-            json={
-                "strategy_id": pytest.backtest_strategy_id,
+            params={
+                "strategy_id": backtest_strategy_id,
                 "symbol": "SH600000",
                 "days": 30
-            },
-            timeout=60
+            }
         )
 
-        # 允许失败（需要真实数据）
-        if response.status_code != 200:
-            pytest.skip("快速回测需要真实数据源")
+        assert response.status_code == 200
+        assert "total_return" in response.json()
 
 
 # ==================
@@ -232,40 +276,25 @@ class TestTradingAPI:
 
         assert "is_running" in data
 
-    def test_start_trading(self):
+    def test_start_trading(self, minimal_strategy_id):
         """测试启动交易端点"""
-        # 创建测试策略
-        strategy_code = "class TestStrategy:\n    def on_bar(self, bar):\n        return None"
-
-        strategy_response = client.post(
-            "/api/v1/strategies",
-            json={
-                "name": "TradingTestStrategy",
-                "code": strategy_code,
-                "status": "live"
-            }
-        )
-
-        if strategy_response.status_code != 200:
+        if minimal_strategy_id is None:
             pytest.skip("策略创建失败")
 
-        strategy_id = strategy_response.json()["id"]
-
         # 启动交易
         response = client.post(
             "/api/v1/trading/start",
             json={
-                "strategy_id": strategy_id,
+                "strategy_id": minimal_strategy_id,
                 "require_approval": True
             }
         )
 
-        # 允许失败（可能需要更多配置）
-        assert response.status_code in [200, 400, 500]
+        assert response.status_code == 200
+        assert response.json()["strategy_id"] == minimal_strategy_id
 
         # 清理
         client.post("/api/v1/trading/stop")
-        client.delete(f"/api/v1/strategies/{strategy_id}")
 
     def test_stop_trading(self):
         """测试停止交易端点"""
@@ -290,6 +319,7 @@ class TestTradingAPI:
         response = client.post(
             "/api/v1/trading/execute",
             json={
+                "strategy_id": 1,
                 "symbol": "SH600000",
                 "action": "buy",
                 "amount": 100,
@@ -297,35 +327,18 @@ class TestTradingAPI:
             }
         )
 
-        # 允许失败（需要交易系统初始化）
-        assert response.status_code in [200, 400, 500]
+        assert response.status_code == 200
+        assert "executed" in response.json()["data"]
 
-    def test_rehydrate_strategy(self):
+    def test_rehydrate_strategy(self, minimal_strategy_id):
         """测试恢复策略状态端点"""
-        # 创建测试策略
-        strategy_code = "class TestStrategy:\n    def on_bar(self, bar):\n        return None"
-
-        strategy_response = client.post(
-            "/api/v1/strategies",
-            json={
-                "name": "RehydrateTestStrategy",
-                "code": strategy_code,
-                "status": "live"
-            }
-        )
-
-        if strategy_response.status_code != 200:
+        if minimal_strategy_id is None:
             pytest.skip("策略创建失败")
 
-        strategy_id = strategy_response.json()["id"]
-
         # 恢复状态
-        response = client.post(f"/api/v1/trading/rehydrate/{strategy_id}")
-
-        assert response.status_code in [200, 400]
+        response = client.post(f"/api/v1/trading/rehydrate/{minimal_strategy_id}")
 
-        # 清理
-        client.delete(f"/api/v1/strategies/{strategy_id}")
+        assert response.status_code == 200
 
 
 # ==================
@@ -335,38 +348,15 @@ class TestTradingAPI:
 class TestShadowAPI:
     """影子账户API集成测试"""
 
-    @pytest.fixture(autouse=True)
-    def setup_strategy(self):
-        """创建测试策略"""
-        strategy_code = "class TestStrategy:\n    def on_bar(self, bar):\n        return None"
-
-        response = client.post(
-            "/api/v1/strategies",
-            json={
-                "name": "ShadowTestStrategy",
-                "code": strategy_code,
-                "status": "shadow"
-            }
-        )
-
-        if response.status_code == 200:
-            pytest.shadow_strategy_id = response.json()["id"]
-
-        yield
-
-        # 清理
-        if hasattr(pytest, "shadow_strategy_id"):
-            client.delete(f"/api/v1/strategies/{pytest.shadow_strategy_id}")
-
-    def test_create_shadow_account(self):
+    def test_create_shadow_account(self, minimal_strategy_id):
         """测试创建影子账户端点"""
-        if not hasattr(pytest, "shadow_strategy_id"):
+        if minimal_strategy_id is None:
             pytest.skip("策略创建失败")
 
         response = client.post(
             "/api/v1/shadow/accounts",
             json={
-                "strategy_id": pytest.shadow_strategy_id,
+                "strategy_id": minimal_strategy_id,
                 "initial_cash": 100000,
                 "observation_days": 7
             }
@@ -484,6 +474,40 @@ class TestRiskAPI:
 
         assert response.status_code == 200
 
+    def test_update_risk_config_single_snapshot(self, monkeypatch):
+        """测试一次配置更新只发布一个参数快照"""
+        from app.api.routes.risk import risk_validator
+
+        published = []
+        publish_config = risk_validator._publish_config
+
+        def counting_publish(**changes):
+            published.append(changes)
+            publish_config(**changes)
+
+        monkeypatch.setattr(risk_validator, "_publish_config", counting_publish)
+
+        response = client.put(
+            "/api/v1/risk/config",
+            json={
+                "total_capital": 100000,
+                "max_total_loss_rate": 0.10,
+                "max_daily_loss_rate": 0.05,
+                "max_strategy_capital_rate": 0.30,
+                "max_single_trade_rate": 0.20
+            }
+        )
+
+        assert response.status_code == 200
+        assert published == [{
+            "total_capital": 100000,
+            "max_total_loss_rate": 0.10,
+            "max_daily_loss_rate": 0.05,
+            "max_strategy_capital_rate": 0.30,
+            "max_single_trade_rate": 0.20
+        }]
+        assert risk_validator.max_strategy_capital_rate == 0.30
+
     def test_update_account_value(self):
         """测试更新账户价值端点"""
         response = client.post(
@@ -535,21 +559,21 @@ class TestRiskAPI:
 class TestHealthAPI:
     """健康检查API测试"""
 
-    def test_health_check(self):
-        """测试健康检查端点"""
-        response = client.get("/health")
+    @pytest.mark.parametrize("path, expected_status", [
+        ("/health", "healthy"),
+        ("/", None),
+    ])
+    def test_health_endpoints(self, path, expected_status):
+        """测试健康检查端点和根端点"""
+        response = client.get(path)
 
         assert response.status_code == 200
-        data = response.json()
 
-        assert data["status"] == "healthy"
-        assert "timestamp" in data
+        if expected_status is not None:
+            data = response.json()
 
-    def test_root_endpoint(self):
-        """测试根端点"""
-        response = client.get("/")
-
-        assert response.status_code == 200
+            assert data["status"] == expected_status
+            assert "timestamp" in data
 
 
 if __name__ == '__main__':
@@ -8,7 +8,46 @@
 
 import pytest
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app.errors import DataSourceError
+from app.services.multi_datasource import DataSourceManager
+
+
+# 共用的真实行情样本
+SAMPLE_SYMBOL = '000001.SZ'
+SAMPLE_DAYS = 30
+
+
+@pytest.fixture(scope="session")
+def ds_manager():
+    """
+    真实数据源管理器（整个测试会话共用）
+
+    数据源SDK内部自行管理HTTP连接，无法注入连接池；
+    共用管理器以复用数据源实例和进程内缓存。
+    需要Mock数据源或独立缓存的测试仍自行创建管理器。
+    """
+    return DataSourceManager()
+
+
+@pytest.fixture(scope="session")
+def sample_ohlcv(ds_manager):
+    """
+    真实行情样本（整个测试会话只请求一次API）
+
+    Returns:
+        000001.SZ 近30天的日线数据
+    """
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = (datetime.now() - timedelta(days=SAMPLE_DAYS)).strftime('%Y-%m-%d')
+
+    try:
+        return ds_manager.fetch_with_fallback(SAMPLE_SYMBOL, start_date, end_date)
+    except Exception as e:
+        pytest.skip(f"AkShare API调用失败，可能是网络问题: {e}")
 
 
 # ==================
@@ -20,112 +59,102 @@ class TestDataSourceIntegration:
 
     @pytest.mark.slow
     @pytest.mark.integration
-    def test_fetch_real_data_akshare(self):
+    def test_fetch_real_data_akshare(self, sample_ohlcv):
         """测试真实AkShare数据获取"""
-        from app.services.multi_datasource import DataSourceManager
-
-        manager = DataSourceManager()
-
-        # 获取近期数据（减少API调用量）
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=10)).strftime('%Y-%m-%d')
-
-        try:
-            data = manager.fetch_with_fallback('000001.SZ', start_date, end_date)
+        data = sample_ohlcv
 
-            # 验证数据格式
-            assert len(data) > 0
-            assert list(data.columns) == ['date', 'open', 'high', 'low', 'close', 'volume']
+        # 验证数据格式
+        assert len(data) > 0
+        assert list(data.columns) == ['date', 'open', 'high', 'low', 'close', 'volume']
 
-            # 验证OHLC关系
-            assert (data['high'] >= data['close']).all()
-            assert (data['high'] >= data['open']).all()
-            assert (data['high'] >= data['low']).all()
-            assert (data['low'] <= data['close']).all()
-            assert (data['low'] <= data['open']).all()
+        # 验证OHLC关系（high/low分别与open、close整体比较）
+        high = data['high'].to_numpy()
+        low = data['low'].to_numpy()
+        open_close = data[['open', 'close']].to_numpy()
 
-            # 验证数据类型
-            assert data['date'].dtype == 'datetime64[ns]'
-            assert data['open'].dtype == 'float64'
-            assert data['volume'].dtype == 'int64'
+        assert (high[:, None] >= open_close).all()
+        assert (low[:, None] <= open_close).all()
+        assert (high >= low).all()
 
-        except Exception as e:
-            pytest.skip(f"AkShare API调用失败，可能是网络问题: {e}")
+        # 验证数据类型
+        assert data['date'].dtype == 'datetime64[ns]'
+        assert data['open'].dtype == 'float64'
+        assert data['volume'].dtype == 'int64'
 
-    @pytest.mark.slow
     @pytest.mark.integration
     def test_data_cache_performance(self, redis_client):
-        """测试数据缓存性能"""
-        from app.services.multi_datasource import DataSourceManager
-        import time
-
+        """测试数据缓存命中（第二次请求不再访问数据源）"""
         manager = DataSourceManager(cache=redis_client)
+        akshare = manager.sources[0]['provider']
 
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d')
+        raw_data = pd.DataFrame({
+            '日期': ['2024-01-02', '2024-01-03'],
+            '开盘': [10.0, 10.2],
+            '最高': [10.5, 10.6],
+            '最低': [9.5, 10.0],
+            '收盘': [10.2, 10.4],
+            '成交量': [1000000, 1200000]
+        })
 
-        try:
-            # 第一次请求（调用API）
-            start_time = time.time()
-            data1 = manager.fetch_with_fallback('000001.SZ', start_date, end_date)
-            api_time = time.time() - start_time
+        with patch.object(akshare, 'fetch', return_value=raw_data) as mock_fetch:
+            # 第一次请求（调用数据源）
+            data1 = manager.fetch_with_fallback('000001.SZ', '2024-01-02', '2024-01-03')
 
             # 第二次请求（从缓存）
-            start_time = time.time()
-            data2 = manager.fetch_with_fallback('000001.SZ', start_date, end_date)
-            cache_time = time.time() - start_time
+            data2 = manager.fetch_with_fallback('000001.SZ', '2024-01-02', '2024-01-03')
 
-            # 验证缓存命中
-            assert cache_time < api_time * 0.1, "缓存应该比API快10倍以上"
+        # 验证缓存命中
+        assert mock_fetch.call_count == 1, "第二次请求应命中缓存"
 
-            # 验证数据一致性
-            pd.testing.assert_frame_equal(data1, data2)
+        # 验证数据一致性
+        pd.testing.assert_frame_equal(data1, data2)
 
-        except Exception as e:
-            pytest.skip(f"API调用失败: {e}")
-
-    @pytest.mark.slow
     @pytest.mark.integration
     def test_fallback_to_baostock(self):
         """测试降级到Baostock（模拟AkShare失败）"""
-        from app.services.multi_datasource import DataSourceManager
-        from unittest.mock import patch
+        manager = DataSourceManager()
+        akshare = manager.sources[0]['provider']
+        baostock = manager.sources[1]['provider']
+
+        # Baostock原始数据为字符串
+        raw_data = pd.DataFrame({
+            'date': ['2024-01-02', '2024-01-03'],
+            'open': ['10.0', '10.2'],
+            'high': ['10.5', '10.6'],
+            'low': ['9.5', '10.0'],
+            'close': ['10.2', '10.4'],
+            'volume': ['1000000', '1200000']
+        })
 
         # Mock AkShare失败
-        with patch('akshare.stock_zh_a_hist', side_effect=Exception("AkShare unavailable")):
-            manager = DataSourceManager()
-
-            end_date = datetime.now().strftime('%Y-%m-%d')
-            start_date = (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d')
-
-            try:
-                # 应该自动降级到Baostock
-                data = manager.fetch_with_fallback('sh.000001', start_date, end_date)
-
-                assert data is not None
-                assert len(data) > 0
+        with patch.object(akshare, 'fetch', side_effect=DataSourceError("AkShare unavailable")), \
+             patch.object(baostock, 'fetch', return_value=raw_data) as mock_bs:
+            # 应该自动降级到Baostock
+            data = manager.fetch_with_fallback('sh.000001', '2024-01-02', '2024-01-03')
 
-            except Exception as e:
-                pytest.skip(f"所有数据源失败: {e}")
+        mock_bs.assert_called_once()
+        assert len(data) == 2
+        assert data['close'].tolist() == [10.2, 10.4]
 
     @pytest.mark.slow
     @pytest.mark.integration
-    def test_fetch_multiple_stocks(self):
+    def test_fetch_multiple_stocks(self, ds_manager, sample_ohlcv):
         """测试批量获取多只股票数据"""
-        from app.services.multi_datasource import DataSourceManager
-
-        manager = DataSourceManager()
-
-        symbols = ['000001.SZ', '600000.SH', '000002.SZ']
+        symbols = [SAMPLE_SYMBOL, '600000.SH', '000002.SZ']
         end_date = datetime.now().strftime('%Y-%m-%d')
         start_date = (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d')
 
-        results = {}
+        # 样本股票复用会话数据，其余股票并发请求
+        results = {SAMPLE_SYMBOL: sample_ohlcv}
+        pending = symbols[1:]
 
         try:
-            for symbol in symbols:
-                data = manager.fetch_with_fallback(symbol, start_date, end_date)
-                results[symbol] = data
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                fetched = executor.map(
+                    lambda symbol: ds_manager.fetch_with_fallback(symbol, start_date, end_date),
+                    pending
+                )
+                results.update(zip(pending, fetched))
 
             # 验证所有股票都获取成功
             assert len(results) == len(symbols)
@@ -155,26 +184,18 @@ class TestDataQualityIntegration:
 
     @pytest.mark.slow
     @pytest.mark.integration
-    def test_halt_stock_handling(self):
+    def test_halt_stock_handling(self, ds_manager):
         """测试停牌股票处理"""
-        from app.services.multi_datasource import DataSourceManager
-
-        manager = DataSourceManager()
-
         # TODO: 找一只停牌的股票进行测试
-        # 例如：data = manager.fetch_with_fallback('停牌股票代码', ...)
+        # 例如：data = ds_manager.fetch_with_fallback('停牌股票代码', ...)
         # 验证停牌日volume=0，价格被正确填充
 
         pytest.skip("需要找到实际停牌股票进行测试")
 
     @pytest.mark.slow
     @pytest.mark.integration
-    def test_ex_dividend_data(self):
+    def test_ex_dividend_data(self, ds_manager):
         """测试除权除息数据处理"""
-        from app.services.multi_datasource import DataSourceManager
-
-        manager = DataSourceManager()
-
         # TODO: 找一只有除权除息的股票
         # 验证复权因子正确应用
 
@@ -188,39 +209,45 @@ class TestDataQualityIntegration:
 class TestRateLimiterIntegration:
     """限流器集成测试"""
 
-    @pytest.mark.slow
     @pytest.mark.integration
     def test_rate_limit_prevents_ip_ban(self, redis_client):
-        """测试限流器防止IP封禁"""
-        from app.services.multi_datasource import DataSourceManager
-        import time
+        """测试限流器防止IP封禁（虚拟时钟，不访问真实数据源）"""
+        from app.services.multi_datasource import RateLimiter
 
         manager = DataSourceManager(cache=redis_client)
 
-        # 模拟快速连续请求
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        now = [1000.0]
+        manager.limiter = RateLimiter(redis_client, limit=1, window=1, clock=lambda: now[0])
 
-        request_count = 0
-        rate_limited_count = 0
+        akshare, baostock, efinance = (source['provider'] for source in manager.sources)
 
-        try:
-            for i in range(5):  # 尝试5次快速请求
-                try:
-                    data = manager.fetch_with_fallback(f'00000{i+1}.SZ', start_date, end_date)
-                    request_count += 1
-                except Exception as e:
-                    if "限流" in str(e) or "rate" in str(e).lower():
-                        rate_limited_count += 1
+        chinese_columns = pd.DataFrame({
+            '日期': ['2024-01-02'], '开盘': [10.0], '最高': [10.5],
+            '最低': [9.5], '收盘': [10.2], '成交量': [1000000]
+        })
+        english_columns = pd.DataFrame({
+            'date': ['2024-01-02'], 'open': ['10.0'], 'high': ['10.5'],
+            'low': ['9.5'], 'close': ['10.2'], 'volume': ['1000000']
+        })
 
-                time.sleep(0.5)  # 每次请求间隔0.5秒
+        with patch.object(akshare, 'fetch', return_value=chinese_columns) as mock_ak, \
+             patch.object(baostock, 'fetch', return_value=english_columns) as mock_bs, \
+             patch.object(efinance, 'fetch', return_value=chinese_columns) as mock_ef:
+            # 同一窗口内快速连续请求：每个数据源只放行一次，依次降级
+            for i in range(3):
+                manager.fetch_with_fallback(f'00000{i+1}.SZ', '2024-01-02', '2024-01-02')
 
-            # 验证限流器工作
-            # 如果没有限流器，可能会被封IP
-            # 有限流器的情况下，部分请求应该被拒绝或延迟
+            assert (mock_ak.call_count, mock_bs.call_count, mock_ef.call_count) == (1, 1, 1)
 
-        except Exception as e:
-            pytest.skip(f"限流测试失败: {e}")
+            # 所有数据源都已限流，请求被拒绝
+            with pytest.raises(DataSourceError):
+                manager.fetch_with_fallback('000004.SZ', '2024-01-02', '2024-01-02')
+
+            # 进入下一个窗口后恢复
+            now[0] += 1
+            manager.fetch_with_fallback('000005.SZ', '2024-01-02', '2024-01-02')
+
+            assert mock_ak.call_count == 2
 
 
 # ==================
@@ -230,42 +257,32 @@ class TestRateLimiterIntegration:
 class TestErrorRecoveryIntegration:
     """错误恢复集成测试"""
 
-    @pytest.mark.slow
     @pytest.mark.integration
     def test_network_timeout_recovery(self):
-        """测试网络超时恢复"""
-        from app.services.multi_datasource import DataSourceManager
-        from unittest.mock import patch
-        import time
-
+        """测试网络超时恢复（失败不被缓存，下一次请求恢复正常）"""
         manager = DataSourceManager()
+        akshare, baostock, efinance = (source['provider'] for source in manager.sources)
+
+        raw_data = pd.DataFrame({
+            '日期': ['2024-01-02'],
+            '开盘': [10.0],
+            '最高': [10.5],
+            '最低': [9.5],
+            '收盘': [10.2],
+            '成交量': [1000000]
+        })
+
+        # AkShare第一次请求超时，第二次成功；其余数据源不可用
+        with patch.object(akshare, 'fetch', side_effect=[DataSourceError("Network timeout"), raw_data]), \
+             patch.object(baostock, 'fetch', side_effect=DataSourceError("Baostock unavailable")), \
+             patch.object(efinance, 'fetch', side_effect=DataSourceError("Efinance unavailable")):
+            with pytest.raises(DataSourceError):
+                manager.fetch_with_fallback('000001.SZ', '2024-01-02', '2024-01-02')
 
-        # Mock第一次请求超时，第二次成功
-        call_count = {'count': 0}
-
-        def side_effect_timeout(*args, **kwargs):
-            call_count['count'] += 1
-            if call_count['count'] == 1:
-                raise Exception("Network timeout")
-            else:
-                # 第二次返回真实数据
-                return pd.DataFrame({
-                    '日期': ['2024-01-01'],
-                    '开盘': [10.0],
-                    '最高': [10.5],
-                    '最低': [9.5],
-                    '收盘': [10.2],
-                    '成交量': [1000000]
-                })
-
-        with patch('akshare.stock_zh_a_hist', side_effect=side_effect_timeout):
-            try:
-                # 应该自动重试或降级
-                data = manager.fetch_with_fallback('000001.SZ', '2024-01-01', '2024-01-01')
-                assert data is not None
-
-            except Exception as e:
-                pytest.skip(f"错误恢复测试失败: {e}")
+            data = manager.fetch_with_fallback('000001.SZ', '2024-01-02', '2024-01-02')
+
+        assert len(data) == 1
+        assert data['close'].iloc[0] == 10.2
 
 
 # ==================
@@ -277,36 +294,20 @@ class TestEndToEndIntegration:
 
     @pytest.mark.slow
     @pytest.mark.integration
-    def test_complete_data_pipeline(self, redis_client):
-        """测试完整数据获取流程"""
-        from app.services.multi_datasource import DataSourceManager
-
-        manager = DataSourceManager(cache=redis_client)
+    def test_complete_data_pipeline(self, sample_ohlcv):
+        """测试完整数据获取流程（缓存命中由test_data_cache_performance覆盖）"""
+        data = sample_ohlcv
 
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-
-        try:
-            # 1. 获取数据
-            data = manager.fetch_with_fallback('000001.SZ', start_date, end_date)
-
-            # 2. 验证数据完整性
-            assert len(data) > 0
-            assert data.isnull().sum().sum() == 0, "数据不应包含缺失值"
+        # 1. 验证数据完整性
+        assert len(data) > 0
+        assert data.isnull().sum().sum() == 0, "数据不应包含缺失值"
 
-            # 3. 验证数据质量
-            assert (data['high'] >= data['low']).all(), "High应该大于等于Low"
-            assert (data['volume'] >= 0).all(), "成交量应该非负"
+        # 2. 验证数据质量
+        assert (data['high'] >= data['low']).all(), "High应该大于等于Low"
+        assert (data['volume'] >= 0).all(), "成交量应该非负"
 
-            # 4. 验证数据排序
-            assert data['date'].is_monotonic_increasing, "日期应该递增排序"
-
-            # 5. 验证缓存
-            cached_data = manager.fetch_with_fallback('000001.SZ', start_date, end_date)
-            pd.testing.assert_frame_equal(data, cached_data)
-
-        except Exception as e:
-            pytest.skip(f"端到端测试失败: {e}")
+        # 3. 验证数据排序
+        assert data['date'].is_monotonic_increasing, "日期应该递增排序"
 
 
 if __name__ == '__main__':
@@ -7,7 +7,7 @@
 """
 
 import pytest
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 
 # ==================
@@ -95,7 +95,7 @@ class TestRiskControlIntegration:
         # 测试5: 单日亏损限制
         print("\n5. 单日亏损限制测试")
         # 模拟单日亏损达到5%
-        validator.update_account_value(95000, datetime.now().strftime('%Y-%m-%d'))
+        validator.update_account_value(95000, date.today().toordinal())
 
         loss_signal = {
             'symbol': 'SH600000',
@@ -113,7 +113,7 @@ class TestRiskControlIntegration:
         # 测试6: 总资金止损
         print("\n6. 总资金止损测试")
         # 模拟总亏损达到10%
-        validator.update_account_value(90000, datetime.now().strftime('%Y-%m-%d'))
+        validator.update_account_value(90000, date.today().toordinal())
 
         stop_loss_signal = {
             'symbol': 'SH600000',
@@ -265,16 +265,13 @@ class TestRiskTradingIntegration:
     """风控与交易系统集成测试"""
 
     @pytest.mark.integration
-    def test_risk_validation_in_trading_flow(self):
+    def test_risk_validation_in_trading_flow(self, storage, trading_manager):
         """测试交易流程中的风控验证"""
-        from app.services.ai_trading_manager import AITradingManager
         from app.services.risk_validator import RiskValidator
-        from app.services.ai_generator import StrategyStorage
 
         print("\n测试交易流程中的风控...")
 
         # 创建测试策略
-        storage = StrategyStorage()
         strategy_id = storage.save({
             "name": "RiskTestStrategy",
             "code": """
@@ -287,8 +284,7 @@ class RiskTestStrategy:
             "status": "live"
         })
 
-        # 初始化交易管理器和风控
-        trading_manager = AITradingManager()
+        # 初始化风控
         validator = RiskValidator(total_capital=100000)
 
         # 模拟交易信号
@@ -312,13 +308,12 @@ class RiskTestStrategy:
         assert 'risk_score' in risk_result
 
     @pytest.mark.integration
-    @pytest.mark.slow
     def test_risk_monitoring_real_time(self):
-        """测试实时风控监控"""
+        """测试实时风控监控（虚拟时钟，不真实等待）"""
         from app.services.risk_validator import RiskValidator
-        import time
 
-        validator = RiskValidator(total_capital=100000)
+        now = [1_700_000_000.0]
+        validator = RiskValidator(total_capital=100000, clock=lambda: now[0])
 
         print("\n测试实时风控监控...")
 
@@ -338,10 +333,11 @@ class RiskTestStrategy:
 
             if result['passed']:
                 trades_count += 1
+                validator.record_trade()
             else:
                 blocked_count += 1
 
-            time.sleep(0.1)  # 模拟实时间隔
+            now[0] += 0.1  # 模拟实时间隔
 
         print(f"✅ 执行交易: {trades_count}, 拦截: {blocked_count}")
         assert trades_count + blocked_count == 10
@@ -428,7 +424,7 @@ class TestRiskConfigDynamic:
         print("\n测试紧急停止机制...")
 
         # 触发紧急停止（总资金亏损>10%）
-        validator.update_account_value(89000, datetime.now().strftime('%Y-%m-%d'))
+        validator.update_account_value(89000, date.today().toordinal())
 
         # 任何交易都应该被拦截
         signals = [
@@ -488,8 +484,9 @@ class TestRiskAudit:
 
     @pytest.mark.integration
     def test_risk_statistics(self):
-        """测试风控统计"""
-        from app.services.risk_validator import RiskValidator
+        """测试风控统计（逐笔验证与批量验证结果一致）"""
+        import numpy as np
+        from app.services.risk_validator import RiskValidator, RISK_REASON_TEXTS
 
         validator = RiskValidator(total_capital=100000)
 
@@ -499,6 +496,7 @@ class TestRiskAudit:
         passed_count = 0
         blocked_count = 0
         total_risk_score = 0
+        single_passed = []
 
         for i in range(100):
             signal = {
@@ -509,6 +507,7 @@ class TestRiskAudit:
             }
 
             result = validator.validate(signal)
+            single_passed.append(result['passed'])
 
             if result['passed']:
                 passed_count += 1
@@ -519,12 +518,29 @@ class TestRiskAudit:
 
         avg_risk_score = total_risk_score / 100
 
+        # 同样的100笔交易按列构造，一次批量验证
+        i = np.arange(100)
+
+        passed, reason_code = validator.validate_batch(
+            action=np.where(i % 2 == 0, 'buy', 'sell'),
+            symbol=np.char.add('SH', (600000 + i % 100).astype(str)),
+            amount=100 + i % 500,
+            price=10.0 + (i % 50) * 0.1,
+            strategy_id=np.zeros(100, dtype=int)
+        )
+        reason_counts = np.bincount(reason_code, minlength=len(RISK_REASON_TEXTS))
+
         print(f"✅ 统计结果:")
         print(f"   通过: {passed_count}")
         print(f"   拦截: {blocked_count}")
         print(f"   平均风险评分: {avg_risk_score:.2f}")
+        for text, count in zip(RISK_REASON_TEXTS[1:], reason_counts[1:]):
+            if count:
+                print(f"   {text}: {count}")
 
         assert passed_count + blocked_count == 100
+        assert passed.tolist() == single_passed
+        assert reason_counts[0] == passed_count
 
 
 if __name__ == '__main__':
@@ -20,7 +20,7 @@ class TestStrategyLifecycle:
 
     @pytest.mark.integration
     @pytest.mark.slow
-    def test_complete_strategy_lifecycle(self):
+    def test_complete_strategy_lifecycle(self, storage, shadow_manager, trading_manager, mock_ohlcv_factory):
         """
         测试策略完整生命周期：
         1. AI生成策略
@@ -33,10 +33,7 @@ class TestStrategyLifecycle:
         from app.services.ai_generator import AIStrategyGenerator
         from app.services.strategy_adapter import StrategyAdapter
         from app.services.backtest_engine import BacktestEngine
-        from app.services.shadow_manager import ShadowManager
-        from app.services.ai_trading_manager import AITradingManager
         from app.config import Config
-        import pandas as pd
 
         # 步骤1: 生成策略
         print("\n步骤1: AI生成策略...")
@@ -79,16 +76,8 @@ class TestStrategyLifecycle:
         # 步骤3: 运行回测（使用模拟数据）
         print("\n步骤3: 运行回测...")
 
-        # 生成模拟数据
-        dates = pd.date_range(start='2024-01-01', end='2024-01-31', freq='D')
-        mock_data = pd.DataFrame({
-            'date': dates,
-            'open': [10.0 + i * 0.1 for i in range(len(dates))],
-            'high': [10.5 + i * 0.1 for i in range(len(dates))],
-            'low': [9.5 + i * 0.1 for i in range(len(dates))],
-            'close': [10.0 + i * 0.1 for i in range(len(dates))],
-            'volume': [1000000] * len(dates)
-        })
+        # 生成模拟数据（2024年1月，31天）
+        mock_data = mock_ohlcv_factory(31)
 
         try:
             engine = BacktestEngine(initial_cash=100000, enable_china_rules=False)
@@ -111,9 +100,6 @@ class TestStrategyLifecycle:
 
         try:
             # 先保存策略到数据库
-            from app.services.ai_generator import StrategyStorage
-
-            storage = StrategyStorage()
             strategy_id = storage.save({
                 "name": strategy_name,
                 "code": strategy_code,
@@ -126,7 +112,6 @@ class TestStrategyLifecycle:
             print(f"✅ 策略已保存: ID={strategy_id}")
 
             # 创建影子账户
-            shadow_manager = ShadowManager()
             shadow_account_id = shadow_manager.create_shadow_account(
                 strategy_id=strategy_id,
                 initial_cash=100000,
@@ -178,8 +163,6 @@ class TestStrategyLifecycle:
         print("\n步骤6: 测试自动交易初始化...")
 
         try:
-            trading_manager = AITradingManager()
-
             # 测试逻辑测试
             logic_test_passed = trading_manager._run_strategy_logic_test(strategy_id)
 
@@ -306,13 +289,9 @@ class TestShadowPromotionFlow:
     """影子账户晋升流程测试"""
 
     @pytest.mark.integration
-    def test_shadow_promotion_criteria(self):
+    def test_shadow_promotion_criteria(self, storage, shadow_manager):
         """测试影子账户晋升条件判断"""
-        from app.services.shadow_manager import ShadowManager
-        from app.services.ai_generator import StrategyStorage
-
         # 创建测试策略
-        storage = StrategyStorage()
         strategy_id = storage.save({
             "name": "PromotionTestStrategy",
             "code": "class TestStrategy:\n    def on_bar(self, bar):\n        return None",
@@ -323,7 +302,6 @@ class TestShadowPromotionFlow:
         })
 
         # 创建影子账户
-        shadow_manager = ShadowManager()
         account_id = shadow_manager.create_shadow_account(
             strategy_id=strategy_id,
             initial_cash=100000,
@@ -352,33 +330,31 @@ class TestShadowPromotionFlow:
             print(f"评分计算需要更多数据: {e}")
 
     @pytest.mark.integration
-    def test_top_strategies_ranking(self):
+    def test_top_strategies_ranking(self, storage, shadow_manager):
         """测试Top策略排名"""
-        from app.services.shadow_manager import ShadowManager
-        from app.services.ai_generator import StrategyStorage
-
-        storage = StrategyStorage()
-        shadow_manager = ShadowManager()
-
-        # 创建多个影子账户
-        strategies = []
-        for i in range(3):
-            strategy_id = storage.save({
+        # 批量创建策略（一次提交），再逐个创建影子账户
+        strategy_ids = storage.save_many([
+            {
                 "name": f"RankingTestStrategy{i}",
                 "code": "class TestStrategy:\n    def on_bar(self, bar):\n        return None",
                 "params": {},
                 "status": "shadow",
                 "annual_return": 0.20 + i * 0.10,
                 "sharpe_ratio": 1.5 + i * 0.5
-            })
+            }
+            for i in range(3)
+        ])
 
-            account_id = shadow_manager.create_shadow_account(
+        account_ids = [
+            shadow_manager.create_shadow_account(
                 strategy_id=strategy_id,
                 initial_cash=100000,
                 observation_days=7
             )
+            for strategy_id in strategy_ids
+        ]
 
-            strategies.append((strategy_id, account_id))
+        assert len(set(account_ids)) == len(strategy_ids)
 
         # 获取Top排名
         top_strategies = shadow_manager.get_top_strategies(limit=10, min_score=0)
@@ -69,6 +69,30 @@ os.system('rm -rf /')
         assert result['safe'] is False
         assert 'os' in result['message'].lower() or '危险' in result['message']
 
+    def test_dangerous_submodule_import_detected(self):
+        """测试检测危险模块的子模块导入"""
+        from app.services.ai_generator import CodeSecurityChecker
+
+        checker = CodeSecurityChecker()
+
+        for code in ("import os.path", "from urllib.request import urlopen"):
+            result = checker.check(code + "\nclass S:\n    def on_bar(self, bar):\n        return None")
+            assert result['safe'] is False
+            assert result['details']['dangerous_imports']
+
+    def test_rule_sets_overridable_with_set(self):
+        """测试规则集可覆盖为普通set"""
+        from app.services.ai_generator import CodeSecurityChecker
+
+        checker = CodeSecurityChecker()
+        checker.DANGEROUS_MODULES = {'numpy'}
+        checker.DANGEROUS_FUNCTIONS = {'print'}
+
+        result = checker.check("import numpy\nclass S:\n    def on_bar(self, bar):\n        print(bar)")
+
+        assert result['safe'] is False
+        assert result['details']['dangerous_imports'] == ['numpy']
+
     def test_eval_exec_detected(self):
         """测试检测eval/exec"""
         from app.services.ai_generator import CodeSecurityChecker
@@ -191,6 +215,16 @@ def function_with_loop(items):
 
         assert complexity >= 3
 
+    def test_bool_ops_and_comprehensions_complexity(self):
+        """测试布尔运算按操作数计数、推导式计入for和if"""
+        from app.services.ai_generator import calculate_complexity
+
+        # 基础1 + and链2
+        assert calculate_complexity("ok = a and b and c") == 3
+
+        # 基础1 + for 1 + if 1
+        assert calculate_complexity("xs = [x for x in items if x > 0]") == 3
+
 
 class TestAIClient:
     """AI客户端测试"""
@@ -456,6 +490,21 @@ class TestPromptBuilder:
 
         assert "示例" in prompt or "example" in prompt.lower()
 
+    def test_examples_changed_after_init(self):
+        """测试初始化后修改示例设置仍然生效"""
+        from app.services.ai_generator import PromptBuilder
+
+        builder = PromptBuilder(include_examples=True)
+        builder.include_examples = False
+        assert "MAStrategy" not in builder.build("创建策略")
+
+        builder.include_examples = True
+        builder.EXAMPLE = "\n示例：{'close': 10}\n"
+        prompt = builder.build("创建策略")
+
+        assert "{'close': 10}" in prompt
+        assert "MAStrategy" not in prompt
+
 
 class TestStrategySandbox:
     """策略沙箱执行测试"""
@@ -601,6 +650,29 @@ class TestStrategyStorage:
         assert loaded["name"] == "加载测试策略"
         assert "LoadStrategy" in loaded["code"]
 
+    def test_save_many_strategies(self):
+        """测试批量保存策略"""
+        from app.services.ai_generator import StrategyStorage
+
+        storage = StrategyStorage()
+
+        strategy_ids = storage.save_many([
+            {
+                "name": f"批量策略{i}",
+                "code": f"class BatchStrategy{i}:\n    pass",
+                "params": {"period": i}
+            }
+            for i in range(5)
+        ])
+
+        assert len(strategy_ids) == 5
+
+        # ID与输入顺序一致
+        for i, strategy_id in enumerate(strategy_ids):
+            loaded = storage.load(strategy_id)
+            assert loaded["name"] == f"批量策略{i}"
+            assert loaded["params"] == {"period": i}
+
     def test_list_strategies(self):
         """测试列出所有策略"""
         from app.services.ai_generator import StrategyStorage
@@ -639,6 +711,23 @@ class TestStrategyStorage:
         loaded = storage.load(strategy_id)
         assert loaded is None
 
+    def test_delete_many_strategies(self):
+        """测试批量删除策略"""
+        from app.services.ai_generator import StrategyStorage
+
+        storage = StrategyStorage()
+
+        strategy_ids = [
+            storage.save({"name": f"批量删除{i}", "code": "class DeleteMe:\n    pass"})
+            for i in range(3)
+        ]
+
+        storage.delete_many(strategy_ids[:2])
+
+        assert storage.load(strategy_ids[0]) is None
+        assert storage.load(strategy_ids[1]) is None
+        assert storage.load(strategy_ids[2]) is not None
+
 
 class TestStrategyValidator:
     """策略逻辑验证测试"""
@@ -93,6 +93,41 @@ class MetricsStrategy:
         assert 'total_trades' in result
         assert 'final_value' in result
 
+    def test_run_stepwise_matches_prefix_runs(self):
+        """测试逐K线结果与按前缀单独回测一致"""
+        from app.services.backtest_engine import BacktestEngine
+
+        strategy_code = """
+class StepStrategy:
+    def __init__(self):
+        self.count = 0
+
+    def on_bar(self, bar):
+        self.count += 1
+        if self.count % 3 == 1:
+            return {'action': 'buy', 'symbol': 'SH600000', 'amount': 100}
+        if self.count % 3 == 0:
+            return {'action': 'sell', 'symbol': 'SH600000', 'amount': 100}
+        return None
+"""
+
+        data = pd.DataFrame({
+            'date': pd.date_range('2024-01-01', periods=8, freq='D'),
+            'open': [10.0] * 8,
+            'high': [10.5] * 8,
+            'low': [9.5] * 8,
+            'close': [10.0, 10.1, 10.2, 10.1, 10.3, 10.4, 10.3, 10.5],
+            'volume': [1000000] * 8
+        })
+
+        steps = list(BacktestEngine(initial_cash=100000).run_stepwise(strategy_code, data, symbol='SH600000'))
+        assert len(steps) == len(data)
+
+        for i, step in enumerate(steps):
+            result = BacktestEngine(initial_cash=100000).run(strategy_code, data.iloc[:i + 1], symbol='SH600000')
+            assert step['final_value'] == result['final_value']
+            assert step['total_trades'] == result['total_trades']
+
 
 class TestPerformanceMetrics:
     """性能指标计算测试"""
@@ -260,6 +260,75 @@ class TestDataNormalizer:
         assert normalizer.is_halt(halt_bar) == True
 
 
+# ==================
+# 进程内缓存测试
+# ==================
+
+class TestLocalCache:
+    """进程内LRU缓存测试"""
+
+    def test_get_set(self):
+        """测试读写缓存"""
+        from app.services.multi_datasource import LocalCache
+
+        cache = LocalCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+
+    def test_expired_entry(self):
+        """测试过期条目不返回"""
+        from app.services.multi_datasource import LocalCache
+
+        cache = LocalCache(maxsize=2, ttl=0)
+        cache.set('a', 1)
+
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_evict_least_recently_used(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        from app.services.multi_datasource import LocalCache
+
+        cache = LocalCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_manager_local_cache_hit(self):
+        """测试重复请求命中进程内缓存，不再调用数据源"""
+        from app.services.multi_datasource import DataSourceManager
+
+        manager = DataSourceManager()
+        provider = Mock()
+        provider.fetch.return_value = pd.DataFrame({
+            'date': ['2024-01-01', '2024-01-02'],
+            'open': [10.0, 10.1],
+            'high': [10.5, 10.6],
+            'low': [9.5, 9.6],
+            'close': [10.2, 10.3],
+            'volume': [1000000, 1100000]
+        })
+        manager.sources[0]['provider'] = provider
+
+        data1 = manager.fetch_with_fallback('000001.SZ', '2024-01-01', '2024-01-02')
+        data2 = manager.fetch_with_fallback('000001.SZ', '2024-01-01', '2024-01-02')
+
+        assert provider.fetch.call_count == 1
+        pd.testing.assert_frame_equal(data1, data2)
+
+        # 修改返回值不影响缓存
+        data2.loc[0, 'close'] = 0.0
+        data3 = manager.fetch_with_fallback('000001.SZ', '2024-01-01', '2024-01-02')
+        assert data3.loc[0, 'close'] == 10.2
+
+
 # ==================
 # 限流器测试
 # ==================
@@ -289,15 +358,15 @@ class TestRateLimiter:
     def test_rate_limit_reset_after_window(self, redis_client):
         """测试限流窗口重置"""
         from app.services.multi_datasource import RateLimiter
-        import time
 
-        limiter = RateLimiter(redis_client, limit=1, window=1)
+        now = [1000.0]
+        limiter = RateLimiter(redis_client, limit=1, window=1, clock=lambda: now[0])
 
         # 第一次请求
         limiter.check('akshare')
 
-        # 等待超过窗口期
-        time.sleep(1.1)
+        # 虚拟时钟越过窗口期
+        now[0] += 1.1
 
         # 窗口重置后应允许请求
         assert limiter.check('akshare') == True
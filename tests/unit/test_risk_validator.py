@@ -92,6 +92,42 @@ class TestTotalCapitalStopLoss:
         assert result['passed'] is False
         assert '总资金止损' in result['reason'] or '止损' in result['reason']
 
+    def test_runtime_threshold_update(self):
+        """测试运行时修改止损参数后阈值生效"""
+        from app.services.risk_validator import RiskValidator
+
+        validator = RiskValidator(
+            total_capital=100000,
+            max_total_loss_rate=0.10,
+            max_daily_loss_rate=0.20
+        )
+        validator.update_account_value(92000)
+
+        signal = {'action': 'buy', 'symbol': 'SH600000', 'amount': 100, 'price': 10.0}
+        assert validator.validate(signal)['passed'] is True
+
+        # 直接赋值与update_config都应重算阈值
+        validator.max_total_loss_rate = 0.05
+        assert validator.validate(signal)['passed'] is False
+
+        validator.update_config({'max_total_loss_rate': 0.10})
+        assert validator.validate(signal)['passed'] is True
+
+    def test_update_config_publishes_new_snapshot(self):
+        """测试update_config整体替换参数快照，旧快照保持不变"""
+        from app.services.risk_validator import RiskValidator
+
+        validator = RiskValidator(total_capital=100000)
+        old = validator._thresholds
+
+        validator.update_config({'max_total_loss_rate': 0.08, 'max_daily_loss_rate': 0.03})
+
+        new = validator._thresholds
+        assert new is not old
+        assert (new.config.max_total_loss_rate, new.config.max_daily_loss_rate) == (0.08, 0.03)
+        assert new.hard_total_loss_value == pytest.approx(8000)
+        assert (old.config.max_total_loss_rate, old.config.max_daily_loss_rate) == (0.10, 0.05)
+
 
 class TestBlacklist:
     """黑名单股票测试（第2层）"""
@@ -175,6 +211,33 @@ class TestDailyLossLimit:
         assert result['passed'] is False
         assert '单日亏损' in result['reason'] or '日内' in result['reason']
 
+    def test_daily_start_value_rolls_over(self):
+        """测试进入新交易日时以上一次账户价值作为今日开始价值"""
+        from datetime import date
+        from app.services.risk_validator import RiskValidator
+
+        validator = RiskValidator(
+            total_capital=100000,
+            max_total_loss_rate=0.50,
+            max_daily_loss_rate=0.05
+        )
+        day = date(2024, 1, 2).toordinal()
+
+        validator.update_account_value(96000, day)
+        validator.update_account_value(94000, day)
+        assert validator.daily_start_value == 100000
+
+        # 次日以94000为基准，跌到92000只亏损约2%
+        validator.update_account_value(92000, day + 1)
+        assert validator.daily_start_value == 94000
+
+        signal = {'action': 'buy', 'symbol': 'SH600000', 'amount': 100, 'price': 10.0}
+        assert validator.validate(signal)['passed'] is True
+
+        # 兼容日期字符串
+        validator.update_account_value(92000, '2024-01-04')
+        assert validator.daily_start_value == 92000
+
 
 class TestStrategyCapitalLimit:
     """单策略资金占用限制测试（第4层）"""
@@ -314,6 +377,43 @@ class TestTradingFrequency:
         assert result['passed'] is False
         assert '频率' in result['reason'] or '过高' in result['reason']
 
+    def test_trading_frequency_window_expires(self):
+        """测试交易记录滑出1小时窗口后恢复（虚拟时钟）"""
+        from app.services.risk_validator import RiskValidator
+
+        now = [1_700_000_000.0]
+        validator = RiskValidator(
+            total_capital=100000,
+            max_trades_per_hour=20,
+            clock=lambda: now[0]
+        )
+
+        for _ in range(20):
+            validator.record_trade()
+
+        signal = {'action': 'buy', 'symbol': 'SH600000', 'amount': 100, 'price': 10.0}
+        assert validator.validate(signal)['passed'] is False
+
+        # 1小时后旧记录过期
+        now[0] += 3600
+        assert validator.validate(signal)['passed'] is True
+
+    def test_count_longer_window(self):
+        """测试统计超过1小时的窗口时不清理记录（虚拟时钟）"""
+        from app.services.risk_validator import RiskValidator
+
+        now = [1_700_000_000.0]
+        validator = RiskValidator(total_capital=100000, clock=lambda: now[0])
+
+        validator.record_trade()
+        now[0] += 1800
+        validator.record_trade()
+        now[0] += 2200
+
+        assert validator._count_recent_trades(hours=2) == 2
+        assert validator._count_recent_trades(hours=2) == 2
+        assert validator._count_recent_trades(hours=1) == 1
+
 
 class TestLimitPriceCheck:
     """涨跌停板检测测试（第7层）"""
@@ -362,6 +462,34 @@ class TestLimitPriceCheck:
         assert result['passed'] is False
         assert '跌停' in result['reason']
 
+    def test_limit_threshold_matches_batch(self):
+        """测试涨跌停阈值附近逐条验证与批量验证结论一致"""
+        from app.services.risk_validator import RiskValidator
+
+        validator = RiskValidator(total_capital=100000)
+        validator.update_prev_close('SH600000', 10.0)
+
+        # 阈值为±9.9%（10%减去0.1%容差），两侧各取贴近阈值的价格
+        cases = [
+            ('buy', 10.9899996, True),
+            ('buy', 10.99, False),
+            ('sell', 9.0100004, True),
+            ('sell', 9.01, False),
+        ]
+
+        passed, _ = validator.validate_batch(
+            [action for action, _, _ in cases],
+            ['SH600000'] * len(cases),
+            [100] * len(cases),
+            [price for _, price, _ in cases],
+            [1] * len(cases)
+        )
+
+        for (action, price, expected), batch_passed in zip(cases, passed):
+            signal = {'action': action, 'symbol': 'SH600000', 'amount': 100, 'price': price}
+            assert validator.validate(signal)['passed'] is expected
+            assert bool(batch_passed) is expected
+
 
 class TestRiskScore:
     """风险评分测试"""
@@ -448,3 +576,37 @@ class TestMultiLayerValidation:
         assert result['passed'] is False
         # 应该包含至少一个失败原因
         assert len(result['reason']) > 0
+
+    def test_validate_batch_matches_validate(self):
+        """测试批量验证与逐条验证结果一致"""
+        from app.services.risk_validator import RiskValidator, RISK_REASON_TEXTS
+        import numpy as np
+
+        validator = RiskValidator(total_capital=100000, blacklist=['SZ000001'])
+        validator.update_prev_close('SH600000', 10.0)
+        validator.update_prev_close('SZ300750', 100.0)
+        validator.update_strategy_capital(strategy_id=2, capital=25000)
+
+        signals = [
+            {'action': 'buy', 'symbol': 'SH600000', 'amount': 100, 'price': 10.5, 'strategy_id': 1},
+            {'action': 'buy', 'symbol': 'SH600000', 'amount': 100, 'price': 11.0, 'strategy_id': 1},
+            {'action': 'buy', 'symbol': 'SZ300750', 'amount': 100, 'price': 115.0, 'strategy_id': 1},
+            {'action': 'sell', 'symbol': 'SZ300750', 'amount': 100, 'price': 80.0, 'strategy_id': 1},
+            {'action': 'buy', 'symbol': 'SZ000001', 'amount': 100, 'price': 10.0, 'strategy_id': 1},
+            {'action': 'buy', 'symbol': 'SH600036', 'amount': 1000, 'price': 10.0, 'strategy_id': 2},
+            {'action': 'buy', 'symbol': 'SH600036', 'amount': 3000, 'price': 10.0, 'strategy_id': 1},
+        ]
+
+        passed, codes = validator.validate_batch(
+            [s['action'] for s in signals],
+            [s['symbol'] for s in signals],
+            [s['amount'] for s in signals],
+            [s['price'] for s in signals],
+            [s['strategy_id'] for s in signals]
+        )
+
+        expected = [validator.validate(s)['passed'] for s in signals]
+        assert passed.tolist() == expected
+        assert list(np.take(RISK_REASON_TEXTS, codes[~passed])) == [
+            '涨停板，不建议买入', '跌停板，不建议卖出', '黑名单股票', '单策略资金占用超限', '单笔交易过大'
+        ]
@@ -126,6 +126,38 @@ class TestScoreCalculation:
         # 分数应该在0-100之间
         assert 0 <= score <= 100
 
+    def test_score_cache_invalidation(self):
+        """测试指标或权重变化后评分重新计算"""
+        from app.services.shadow_manager import ShadowManager
+
+        manager = ShadowManager()
+
+        account_id = manager.create_shadow_account(strategy_id=1, initial_cash=100000)
+        manager.update_account_metrics(account_id, {'annual_return': 0.50, 'win_rate': 0.50})
+
+        score = manager.calculate_score(account_id)
+        assert manager.calculate_score(account_id) == score
+
+        manager.update_account_metrics(account_id, {'annual_return': 0.80, 'win_rate': 0.50})
+        assert manager.calculate_score(account_id) > score
+
+        manager.set_score_weights({'annual_return': 1.0})
+        assert manager.calculate_score(account_id) == 80.0
+
+    def test_score_weights_read_only(self):
+        """测试评分权重只能通过set_score_weights修改"""
+        from app.services.shadow_manager import ShadowManager
+
+        manager = ShadowManager()
+
+        with pytest.raises(TypeError):
+            manager.score_weights['annual_return'] = 1.0
+
+        with pytest.raises(AttributeError):
+            manager.score_weights = {'annual_return': 1.0}
+
+        assert manager.score_weights['annual_return'] == 0.30
+
 
 class TestTimeWeight:
     """时间权重测试"""
@@ -176,6 +208,24 @@ class TestTimeWeight:
         # 今天的高收益权重应该更大
         assert weighted_return > 0
 
+    def test_invalid_record_date_rejected(self):
+        """测试日期无效的记录不会写入"""
+        from app.services.shadow_manager import ShadowManager
+
+        manager = ShadowManager()
+
+        account_id = manager.create_shadow_account(strategy_id=1, initial_cash=100000)
+        manager.add_daily_record(account_id, {
+            'date': datetime.now().strftime('%Y-%m-%d'),
+            'return': 0.05
+        })
+
+        with pytest.raises(ValueError):
+            manager.add_daily_record(account_id, {'date': 'not-a-date', 'return': 0.10})
+
+        assert len(manager.get_account(account_id)['daily_records']) == 1
+        assert manager._calculate_weighted_return(account_id) == pytest.approx(0.05)
+
 
 class TestTopStrategies:
     """Top N策略筛选测试"""
@@ -230,6 +280,28 @@ class TestTopStrategies:
         for strategy in top_strategies:
             assert strategy['score'] >= 30.0
 
+    def test_returned_accounts_are_copies(self):
+        """测试修改返回的账户信息不影响排名"""
+        from app.services.shadow_manager import ShadowManager
+
+        manager = ShadowManager()
+
+        account_id = manager.create_shadow_account(strategy_id=1, initial_cash=100000)
+        manager.update_account_metrics(account_id, {'annual_return': 0.50, 'win_rate': 0.50})
+        score = manager.calculate_score(account_id)
+
+        account = manager.get_account(account_id)
+        account['status'] = 'terminated'
+        account['score'] = 0.0
+
+        top_strategies = manager.get_top_strategies(limit=3, min_score=10.0)
+        assert [s['id'] for s in top_strategies] == [account_id]
+        top_strategies[0]['score'] = 0.0
+
+        account = manager.get_account(account_id)
+        assert account['status'] == 'observing'
+        assert account['score'] == score
+
 
 class TestPromotion:
     """晋升条件测试"""
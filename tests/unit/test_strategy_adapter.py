@@ -86,6 +86,26 @@ class StatefulStrategy:
         assert signal2['counter'] == 2
         assert signal2['avg_price'] == 11.0
 
+    def test_declared_strategy_class(self):
+        """测试通过__strategy__指定策略类"""
+        from app.services.strategy_adapter import StandardStrategy
+
+        code = """
+class Helper:
+    def on_bar(self, bar):
+        return {'source': 'helper'}
+
+class MainStrategy:
+    def on_bar(self, bar):
+        return {'source': 'main'}
+
+__strategy__ = 'MainStrategy'
+"""
+
+        strategy = StandardStrategy(code)
+
+        assert strategy.on_bar({'close': 10.0})['source'] == 'main'
+
 
 class TestStrategyAdapter:
     """策略适配器测试"""
@@ -249,6 +269,97 @@ class UnlockStrategy:
         assert order2['action'] == 'sell'
         assert order2.get('blocked_by_t1') is not True
 
+    def test_process_bars_matches_process_bar(self):
+        """测试批量处理与逐根处理结果一致"""
+        import pandas as pd
+        from app.services.strategy_adapter import StrategyAdapter
+
+        code = """
+class BatchStrategy:
+    def __init__(self):
+        self.bar_count = 0
+
+    def on_bar(self, bar):
+        self.bar_count += 1
+        if self.bar_count % 2 == 1:
+            return {'action': 'buy', 'amount': 100, 'symbol': 'SH600000'}
+        return {'action': 'sell', 'amount': 100, 'symbol': 'SH600000'}
+"""
+
+        bars = pd.DataFrame({
+            'date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-02', '2024-01-03']),
+            'close': [10.0, 10.1, 10.2, 10.3, 10.4]
+        })
+
+        batch = StrategyAdapter(code, strategy_id=1).process_bars(bars)
+
+        single_adapter = StrategyAdapter(code, strategy_id=1)
+        single = [
+            single_adapter.process_bar({'date': str(row['date'].date()), 'close': row['close']})
+            for _, row in bars.iterrows()
+        ]
+
+        assert batch == single
+        # 同日卖出被T+1拦截
+        assert batch[1] is None
+        assert batch[2]['action'] == 'buy'
+
+    def test_non_string_dates_supported(self):
+        """测试Timestamp/datetime及非补零字符串日期的T+1处理"""
+        import pandas as pd
+        from app.services.strategy_adapter import StrategyAdapter
+
+        code = """
+class DateStrategy:
+    def __init__(self):
+        self.bar_count = 0
+
+    def on_bar(self, bar):
+        self.bar_count += 1
+        if self.bar_count == 1:
+            return {'action': 'buy', 'amount': 100, 'symbol': 'SH600000'}
+        return {'action': 'sell', 'amount': 100, 'symbol': 'SH600000'}
+"""
+
+        # process_bar：Timestamp、datetime、非补零字符串混用
+        adapter = StrategyAdapter(code, strategy_id=1)
+        adapter.process_bar({'date': pd.Timestamp('2024-01-05'), 'close': 10.0})
+        assert adapter.is_locked('SH600000')
+
+        assert adapter.process_bar({'date': datetime(2024, 1, 5, 14, 0), 'close': 10.1}) is None
+        order = adapter.process_bar({'date': '2024-1-8', 'close': 10.2})
+        assert order['action'] == 'sell'
+
+        # process_bars：object列中的Timestamp
+        bars = pd.DataFrame({
+            'date': pd.Series(
+                [pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-08')],
+                dtype=object
+            ),
+            'close': [10.0, 10.1, 10.2]
+        })
+        results = StrategyAdapter(code, strategy_id=1).process_bars(bars)
+
+        assert results[0]['action'] == 'buy'
+        assert results[1] is None
+        assert results[2]['action'] == 'sell'
+
+    def test_invalid_date_rejected(self):
+        """测试无法识别的日期抛出ValidationError"""
+        from app.errors import ValidationError
+        from app.services.strategy_adapter import StrategyAdapter
+
+        code = """
+class NoopStrategy:
+    def on_bar(self, bar):
+        return None
+"""
+
+        adapter = StrategyAdapter(code, strategy_id=1)
+
+        with pytest.raises(ValidationError):
+            adapter.process_bar({'date': '2024-13-45', 'close': 10.0})
+
 
 class TestTechnicalIndicators:
     """技术指标状态测试"""